@@ -19,6 +19,8 @@ import poly_convert
 from paintall import DrawingApp
 
 DEBUG = False
+# Keep prepared scenarios in a cache file next to them
+USE_CACHE = False
 
 
 # For build:
@@ -332,10 +334,10 @@ class App(QMainWindow):
 
     def load_data(self, filename, solver=0):
         self.loaded = True
-        self.data, self.frame, new_format = plot.prepare_file(filename)
+        self.data, self.frame, new_format = plot.prepare_file(filename, cache=USE_CACHE)
         if new_format:
             self.has_two_trajs = plot.check_multiply_trajs(filename)
-            self.data, self.frame, new_format = plot.prepare_file(filename, solver)
+            self.data, self.frame, new_format = plot.prepare_file(filename, solver, cache=USE_CACHE)
             self.solver_info, self.info_msg = plot.get_path_info(filename, solver)
         else:
             self.has_two_trajs = False
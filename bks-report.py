@@ -1,18 +1,19 @@
 #!/usr/bin/env python3
 import ctypes
-import glob
 import io
 import json
 import os
-import subprocess
-import time
 from datetime import datetime
 
 import mpld3
 from matplotlib import pyplot as plt
 from mpld3 import plugins
 
+from corpus_index import CorpusIndex
 from plot import plot_from_files
+from simulator.data import is_case
+from simulator.runner import OUTPUTS, Runner
+from simulator.workspace import WorkspacePool
 
 
 def fix_returncode(code):
@@ -21,50 +22,77 @@ def fix_returncode(code):
 
 class Report:
 
-    def __init__(self, executable, interactive=False):
+    def __init__(self, executable, interactive=False, index=None, timeout=None, cache_dir=None, log_dir=None,
+                 output_dir=None):
         self.exe = executable
         self.interactive = interactive
+        self.index = index
+        self.timeout = timeout
+        # Whole solver output goes to a log file per case, the report keeps only its first and last lines
+        self.log_dir = os.path.abspath(log_dir) if log_dir is not None else None
+        if self.log_dir is not None:
+            os.makedirs(self.log_dir, exist_ok=True)
+        # Solver outputs are collected into a tree mirroring cases, the case tree root itself updates cases in place
+        self.output_dir = os.path.abspath(output_dir) if output_dir is not None else None
+        # Cases are run in a RAM disk workspace, source tree is only read
+        self.workspaces = WorkspacePool(1)
+        self.runner = Runner(executable, cache_dir, self.workspaces)
         self.cases = []
         self.work_dir = os.path.abspath(os.getcwd())
         self.tmpdir = os.path.join(self.work_dir, ".bks_report\\")
 
-    def generate(self, data_directory, rvo=None):
+    def generate(self, data_directory, rvo=None, changed_since=None):
+        if self.index is not None:
+            # Only changed cases are re-read, the rest comes from the index
+            self.index.update(data_directory)
+            root = os.path.abspath(data_directory)
+            for case in self.index.cases(changed_since=changed_since):
+                # The root is a case itself when a single case directory is given
+                if case == root or case.startswith(os.path.join(root, '')):
+                    self.run_case(case, self.exe, rvo)
+            return
         for root, dirs, files in os.walk(data_directory):
-            if "nav-data.json" in files or 'navigation.json' in files:
+            if is_case(files):
                 self.run_case(os.path.join(data_directory, root), self.exe, rvo)
 
     def run_case(self, datadir, usv, rvo=None):
-        working_dir = os.path.abspath(os.getcwd())
-        os.chdir(datadir)
+        with self.workspaces.acquire() as workspace:
+            workspace.populate(datadir)
+            self.run_workspace(datadir, workspace.directory, usv, rvo)
+            if self.output_dir is not None:
+                destination = os.path.join(self.output_dir, os.path.relpath(os.path.abspath(datadir), self.work_dir))
+                os.makedirs(destination, exist_ok=True)
+                # Outputs of an earlier run which this one did not write must not stay
+                for filename in OUTPUTS:
+                    if not os.path.isfile(os.path.join(workspace.directory, filename)):
+                        try:
+                            os.remove(os.path.join(destination, filename))
+                        except FileNotFoundError:
+                            pass
+                workspace.collect(destination, OUTPUTS)
 
-        # Get a list of old results
-        file_list = glob.glob('maneuver*.json') + glob.glob('nav-report.json')
-        for filePath in file_list:
-            try:
-                os.remove(filePath)
-            except OSError:
-                pass
+    def run_workspace(self, datadir, workspace_dir, usv, rvo=None):
+        working_dir = os.path.abspath(os.getcwd())
+        log_file = None
+        if self.log_dir is not None:
+            case_name = os.path.relpath(os.path.abspath(datadir), self.work_dir).replace(os.sep, "__")
+            log_file = os.path.join(self.log_dir, case_name + ".log")
+        os.chdir(workspace_dir)
 
         # Print the exit code.
-        exec_time = time.time()
-        completedProc = subprocess.run([usv, "--targets", "target-data.json",
-                                        "--settings", "settings.json",
-                                        "--nav-data", "nav-data.json",
-                                        "--hydrometeo", "hmi-data.json",
-                                        "--constraints", "constraints.json",
-                                        "--route", "route-data.json",
-                                        "--maneuver", "maneuver.json",
-                                        "--analyse", "nav-report.json",
-                                        "--predict", "target-maneuvers.json",
-                                        ("--rvo" if rvo is True else "--no-rvo" if rvo is False else "")],
-                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        exec_time = time.time() - exec_time
-
-        print("{} .Return code: {}. Exec time: {} sec"
-              .format(datadir, fix_returncode(completedProc.returncode), exec_time))
+        runner = self.runner if usv == self.exe else Runner(usv)
+        result = runner.execute(".", rvo=rvo is True, no_rvo=rvo is False, timeout=self.timeout, log_file=log_file)
+        if result.timed_out:
+            # Killed solver may exit with any code, the case must be reported as failed
+            result.stdout, result.return_code = result.stdout + b"\nTimeout expired", -9
+        return_code = fix_returncode(result.return_code)
+        exec_time = result.exec_time
+
+        print("{} .Return code: {}. Exec time: {} sec{}"
+              .format(datadir, return_code, exec_time, " (cached)" if result.cached else ""))
         image_data = ""
         nav_report = ""
-        if fix_returncode(completedProc.returncode) in (0, 1):
+        if return_code in (0, 1):
             if os.path.isfile("maneuver.json"):
                 fig = plot_from_files("maneuver.json", route_file="route-data.json", poly_file="constraints.json")
                 if self.interactive:
@@ -83,10 +111,17 @@ class Report:
             pass
 
         os.chdir(working_dir)
+        if self.index is not None:
+            # Cached results were not measured now, the recorded time is kept
+            self.index.record_run(datadir, return_code, None if result.cached else exec_time)
         self.cases.append({"datadir": datadir,
-                           "proc": completedProc,
+                           "return_code": return_code,
+                           "stdout": result.stdout.decode("utf-8", errors="replace"),
+                           "log_file": log_file,
                            "image_data": image_data,
                            "exec_time": exec_time,
+                           "usage": result.usage,
+                           "cached": result.cached,
                            "nav_report": nav_report})
 
     def saveHTML(self, filename):
@@ -153,7 +188,7 @@ class Report:
 <h1>Report from {datetime}</h1>""".format(datetime=datetime.now(), styles=css)
 
         for case in self.cases:
-            if case["proc"].returncode in (0, 1):
+            if case["return_code"] in (0, 1):
                 img_tag = case["image_data"]
             else:
                 img_tag = ""
@@ -166,18 +201,30 @@ class Report:
 </div>
 <div class="stdout">
 <p>Return code: {return_code}</p>
-<p>Execution time: {exec_time} seconds</p>
+<p>Execution time: {exec_time} seconds{cached}</p>
+<p>CPU time: {cpu_time}</p>
+<p>Peak memory: {max_rss}</p>
 <input type="checkbox" text="Situation report">
 <pre>{nav_report}</pre>
+{log_link}
 <input type="checkbox" text="STDOUT"{checked}>
 <pre>{stdout}</pre>
 </div></div></div>""".format(casename=case["datadir"],
-                             return_code=fix_returncode(case["proc"].returncode),
+                             return_code=case["return_code"],
                              exec_time=case["exec_time"],
-                             stdout=str(case["proc"].stdout.decode("utf-8")),
+                             cached=" (cached result of an earlier run, not measured now)" if case["cached"] else "",
+                             cpu_time="user {:.3f} s, system {:.3f} s".format(case["usage"].user_time,
+                                                                              case["usage"].system_time)
+                             if case["usage"] is not None else "n/a",
+                             max_rss="{:.1f} MB".format(case["usage"].max_rss / 2 ** 20)
+                             if case["usage"] is not None else "n/a",
+                             stdout=case["stdout"],
+                             log_link='<p>Full output: <a href="{0}">{0}</a></p>'.format(
+                                 os.path.relpath(case["log_file"], os.path.dirname(os.path.abspath(filename))))
+                             if case["log_file"] is not None else "",
                              nav_report=case["nav_report"],
                              image=img_tag,
-                             checked=" checked" if case["proc"].returncode in (0, 1) else "")
+                             checked=" checked" if case["return_code"] in (0, 1) else "")
 
         html += "</body></html>"
         with io.open(filename, "w", encoding="utf-8") as f:
@@ -192,6 +239,15 @@ if __name__ == "__main__":
     parser.add_argument("--rvo", action="store_true", help="Run USV with --rvo")
     parser.add_argument("--no-rvo", action="store_true", help="Run USV with --no-rvo")
     parser.add_argument("--interactive", action="store_true", help="Make interactive plots (can be heavy)")
+    parser.add_argument("--timeout", type=float, help="Kill solver after this number of seconds")
+    parser.add_argument("--cache-dir", type=str, help="Directory of solver result cache, "
+                                                      "cases with unchanged solver and inputs are not rerun")
+    parser.add_argument("--log-dir", type=str, help="Directory to write whole solver output of every case to")
+    parser.add_argument("--output-dir", type=str, help="Directory to collect solver outputs of every case to, "
+                                                       "mirroring the case tree; '.' updates cases in place")
+    parser.add_argument("--index", type=str, help="Corpus index database to take cases from and record results to")
+    parser.add_argument("--changed-since", type=float, help="Only run cases changed after this timestamp "
+                                                            "(requires --index)")
     args = parser.parse_args()
 
     use_rvo = None
@@ -202,6 +258,9 @@ if __name__ == "__main__":
 
     cur_dir = os.path.abspath(os.getcwd())
     usv_executable = os.path.join(cur_dir, args.executable)
-    report = Report(usv_executable, interactive=args.interactive)
-    report.generate(cur_dir, rvo=use_rvo)
+    corpus_index = CorpusIndex(args.index) if args.index is not None else None
+    report = Report(usv_executable, interactive=args.interactive, index=corpus_index, timeout=args.timeout,
+                    cache_dir=args.cache_dir, log_dir=args.log_dir, output_dir=args.output_dir)
+    report.generate(cur_dir, rvo=use_rvo, changed_since=args.changed_since)
     report.saveHTML("report.html")
+    report.workspaces.close()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import json
+import os
+import sqlite3
+import time
+
+from simulator.data import is_case
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    path TEXT PRIMARY KEY,
+    mtime REAL,
+    targets INTEGER,
+    segments INTEGER,
+    lat_min REAL,
+    lat_max REAL,
+    lon_min REAL,
+    lon_max REAL,
+    return_code INTEGER,
+    exec_time REAL,
+    indexed REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    case_path TEXT,
+    name TEXT,
+    mtime REAL,
+    size INTEGER,
+    PRIMARY KEY (case_path, name)
+);
+CREATE INDEX IF NOT EXISTS cases_mtime ON cases (mtime);
+CREATE INDEX IF NOT EXISTS cases_targets ON cases (targets);
+"""
+
+
+def load_json(directory, filename):
+    try:
+        with open(os.path.join(directory, filename)) as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def case_summary(directory):
+    """
+    Reads summary of case files
+    :param directory: case directory
+    :return: number of targets, number of maneuver segments, bounding box of known points
+    """
+    targets = load_json(directory, 'target-data.json') or []
+    nav_data = load_json(directory, 'nav-data.json') or load_json(directory, 'navigation.json')
+    route = load_json(directory, 'route-data.json')
+    maneuver = load_json(directory, 'maneuver.json')
+
+    segments = None
+    if isinstance(maneuver, list):
+        segments = sum(len(solution['path']['items']) for solution in maneuver)
+
+    points = [(obj['lat'], obj['lon']) for obj in targets + [nav_data] if obj is not None and 'lat' in obj]
+    if route is not None:
+        points.extend((item['lat'], item['lon']) for item in route['items'])
+    if points:
+        lats, lons = zip(*points)
+        bbox = min(lats), max(lats), min(lons), max(lons)
+    else:
+        bbox = None, None, None, None
+    return len(targets), segments, bbox
+
+
+class CorpusIndex:
+    """
+    Persistent SQLite index of a case tree, updated incrementally by file mtime
+    """
+
+    def __init__(self, filename):
+        self.db = sqlite3.connect(filename)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def update(self, root):
+        """
+        Scans the tree and re-reads only cases whose files changed
+        :param root: root of case tree
+        :return: list of updated case paths
+        """
+        root = os.path.abspath(root)
+        updated, seen = [], set()
+        for directory, dirs, files in os.walk(root):
+            if not is_case(files):
+                continue
+            seen.add(directory)
+            stats = {}
+            for name in files:
+                if name.endswith('.json'):
+                    stat = os.stat(os.path.join(directory, name))
+                    stats[name] = (stat.st_mtime, stat.st_size)
+            known = {name: (mtime, size) for name, mtime, size in
+                     self.db.execute("SELECT name, mtime, size FROM files WHERE case_path = ?", (directory,))}
+            if known == stats:
+                continue
+
+            targets, segments, bbox = case_summary(directory)
+            with self.db:
+                self.db.execute("DELETE FROM files WHERE case_path = ?", (directory,))
+                self.db.executemany("INSERT INTO files VALUES (?, ?, ?, ?)",
+                                    [(directory, name, mtime, size) for name, (mtime, size) in stats.items()])
+                self.db.execute("INSERT INTO cases (path, mtime, targets, segments, lat_min, lat_max, lon_min, "
+                                "lon_max, indexed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                                "ON CONFLICT(path) DO UPDATE SET mtime = excluded.mtime, "
+                                "targets = excluded.targets, segments = excluded.segments, "
+                                "lat_min = excluded.lat_min, lat_max = excluded.lat_max, "
+                                "lon_min = excluded.lon_min, lon_max = excluded.lon_max, indexed = excluded.indexed",
+                                (directory, max((mtime for mtime, _ in stats.values()), default=None),
+                                 targets, segments) + tuple(bbox) + (time.time(),))
+            updated.append(directory)
+
+        # Forget cases removed from the tree
+        removed = [path for path, in self.db.execute("SELECT path FROM cases")
+                   if (path == root or path.startswith(os.path.join(root, ''))) and path not in seen]
+        with self.db:
+            self.db.executemany("DELETE FROM cases WHERE path = ?", [(path,) for path in removed])
+            self.db.executemany("DELETE FROM files WHERE case_path = ?", [(path,) for path in removed])
+        return updated
+
+    def record_run(self, path, return_code, exec_time):
+        """
+        Stores result of the last solver run on a case
+        :param path: case directory
+        :param return_code: solver return code
+        :param exec_time: execution time, seconds; None keeps the recorded one
+        """
+        with self.db:
+            self.db.execute("UPDATE cases SET return_code = ?, exec_time = COALESCE(?, exec_time) WHERE path = ?",
+                            (return_code, exec_time, os.path.abspath(path)))
+
+    def cases(self, changed_since=None, min_targets=None, max_targets=None, return_code=None):
+        """
+        Selects indexed cases
+        :param changed_since: only cases with files modified after this timestamp
+        :param min_targets: minimal number of targets
+        :param max_targets: maximal number of targets
+        :param return_code: only cases whose last run returned this code
+        :return: list of case paths
+        """
+        conditions, params = [], []
+        for condition, value in (("mtime > ?", changed_since), ("targets >= ?", min_targets),
+                                 ("targets <= ?", max_targets), ("return_code = ?", return_code)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        query = "SELECT path FROM cases"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return [path for path, in self.db.execute(query + " ORDER BY path", params)]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Corpus index of case directories")
+    parser.add_argument("root_dir", type=str, nargs='?', help="Path cases root", default=os.getcwd())
+    parser.add_argument("--index", type=str, default="corpus-index.sqlite", help="Index database file")
+    parser.add_argument("--changed-since", type=float, help="List cases changed after this timestamp")
+    parser.add_argument("--min-targets", type=int, help="List cases with at least this number of targets")
+    parser.add_argument("--max-targets", type=int, help="List cases with at most this number of targets")
+    args = parser.parse_args()
+
+    index = CorpusIndex(args.index)
+    changed = index.update(args.root_dir)
+    print('{} cases updated'.format(len(changed)))
+    for case in index.cases(changed_since=args.changed_since, min_targets=args.min_targets,
+                            max_targets=args.max_targets):
+        print(case)
+    index.close()
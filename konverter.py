@@ -1,6 +1,10 @@
 import math
+
 from geographiclib.geodesic import Geodesic
 
+# Local frame and fast geodesics live in the simulator package, kept importable from here
+from simulator.geodesy import Frame, local_direct, local_inverse  # noqa: F401
+
 
 def positions(pos_angle, pos_dist):
     """
@@ -53,35 +57,3 @@ def coords_global(x, y, lat, lon):
     dist = (x ** 2 + y ** 2) ** .5
     path = Geodesic.WGS84.Direct(lat, lon, azi1, dist * 1852)
     return path['lat2'], path['lon2']
-
-
-class Frame:
-    def __init__(self, lat, lon):
-        self.lat = lat
-        self.lon = lon
-
-    def from_wgs(self, lat, lon):
-        """
-        Converts WGS coords to local
-        :param lat:
-        :param lon:
-        :return: x, y, distance, bearing
-        """
-        path = Geodesic.WGS84.Inverse(self.lat, self.lon, lat, lon)
-
-        angle = math.radians(path['azi1'])
-        dist = path['s12'] / 1852
-        return dist * math.cos(angle), dist * math.sin(angle), dist, angle
-
-    def to_wgs(self, x, y):
-        """
-        Converts local coords to WGS
-        :param x:
-        :param y:
-        :return: lat, lon
-        """
-        azi1 = math.degrees(math.atan2(y, x))
-        dist = (x ** 2 + y ** 2) ** .5
-        path = Geodesic.WGS84.Direct(self.lat, self.lon, azi1, dist * 1852)
-        return path['lat2'], path['lon2']
-
@@ -8,9 +8,14 @@ from matplotlib.patches import Ellipse, Polygon
 
 from app import *
 from konverter import Frame
+from simulator.cache import load_cached, save_cached
+from simulator.stream import iter_json_array
 
 Position = namedtuple('Position', ['x', 'y', 'course', 'vel'])
 
+# Fields of prepared items, stored as columns of a numeric array in the cache
+PREPARED_FIELDS = ('begin_angle', 'curve', 'length', 'duration', 'starboard_dev', 'port_dev', 'X', 'Y')
+
 
 def item_position(item, time):
     vel = item['length'] / item['duration']
@@ -204,13 +209,62 @@ def get_path_info(filename, solver):
     return file_data[solver]['solver_name'], file_data[solver]['msg']
 
 
-def prepare_file(filename, solver=0):
+def prepare_file(filename, solver=0, cache=False):
     """
     Prepares data from file to plot
     :param filename: name of file
     :param solver: index of solution (if exist)
+    :param cache: reuse prepared data from the cache file next to filename while sources are unchanged
     :return: path, convertation frame, new_format flag
     """
+    if not cache:
+        return _prepare_file(filename, solver)
+    dirname, basename = os.path.split(filename)
+    key = 'prepare:{}:{}'.format(basename, solver)
+    sources = [basename, 'target-maneuvers.json', 'predicted_tracks.json', 'real-target-maneuvers.json']
+    arrays = load_cached(dirname, key, sources)
+    # Entries written before items were stored as arrays are rebuilt
+    if arrays is not None and 'items' in arrays:
+        return _unpack_prepared(arrays)
+    paths, frame, new_format = _prepare_file(filename, solver)
+    arrays = _pack_prepared(paths, frame, new_format)
+    if arrays is not None:
+        save_cached(dirname, key, sources, arrays)
+    return paths, frame, new_format
+
+
+def _pack_prepared(paths, frame, new_format):
+    """
+    Packs prepared paths into arrays for the cache, only small per-path flags are kept as JSON
+    :return: dict of arrays, or None if items have other fields than PREPARED_FIELDS
+    """
+    items = [item for path in paths for item in path['items']]
+    if any(item.keys() != set(PREPARED_FIELDS) for item in items):
+        return None
+    return {'items': np.array([[item[name] for name in PREPARED_FIELDS] for item in items],
+                              dtype=float).reshape(-1, len(PREPARED_FIELDS)),
+            'counts': np.array([len(path['items']) for path in paths], dtype=np.int64),
+            'times': np.array([[path['start_time'], path['time']] for path in paths], dtype=float).reshape(-1, 2),
+            'json': np.array(json.dumps({'flags': [{key: value for key, value in path.items()
+                                                    if key not in ('items', 'start_time', 'time')}
+                                                   for path in paths],
+                                         'frame': [frame.lat, frame.lon], 'new_format': new_format}))}
+
+
+def _unpack_prepared(arrays):
+    # Reverse of _pack_prepared
+    meta = json.loads(str(arrays['json']))
+    rows = np.split(arrays['items'], np.cumsum(arrays['counts'])[:-1]) if len(arrays['counts']) else []
+    paths = []
+    for items, (start_time, time), flags in zip(rows, arrays['times'].tolist(), meta['flags']):
+        path = {'items': [dict(zip(PREPARED_FIELDS, item)) for item in items.tolist()],
+                'start_time': start_time, 'time': time}
+        path.update(flags)
+        paths.append(path)
+    return paths, Frame(*meta['frame']), meta['new_format']
+
+
+def _prepare_file(filename, solver=0):
     new_format = False
     with open(filename) as f:
         file_data = json.loads(f.read())
@@ -224,7 +278,7 @@ def prepare_file(filename, solver=0):
             print('Path: ', dirname)
         try:
             with open(os.path.join(dirname, 'target-maneuvers.json')) as f:
-                target_data = json.loads(f.read())
+                target_data = list(iter_json_array(f))
                 if DEBUG:
                     print('Loaded target data')
         except FileNotFoundError:
@@ -236,7 +290,7 @@ def prepare_file(filename, solver=0):
         has_real = False
         try:
             with open(os.path.join(dirname, 'real-target-maneuvers.json')) as f:
-                real_target_data = json.loads(f.read())
+                real_target_data = list(iter_json_array(f))
                 if DEBUG:
                     print('Loaded real target data')
             for obj in real_target_data:
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+import os
+
+from simulator.archive import pack, unpack
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Packs case tree into a single archive and back")
+    parser.add_argument("command", choices=["pack", "unpack"], help="Pack tree or unpack archive")
+    parser.add_argument("archive", type=str, help="Archive file")
+    parser.add_argument("root_dir", type=str, nargs='?', help="Path cases root", default=os.getcwd())
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        print('{} cases packed'.format(pack(args.root_dir, args.archive)))
+    else:
+        unpack(args.archive, args.root_dir)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+
+from simulator.runner import Runner
+from simulator.sweep import find_cases, grid, random_sample, sweep, write_csv
+
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_space(items, separator):
+    space = {}
+    for item in items:
+        key, values = item.split('=', 1)
+        space[key] = [parse_value(value) for value in values.split(separator)]
+    return space
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Runs solver over a grid or random sample of settings")
+    parser.add_argument("executable", type=str, help="Path to USV executable")
+    parser.add_argument("cases", type=str, nargs='+', help="Case directories or roots of case trees")
+    parser.add_argument("--grid", type=str, action='append', default=[], metavar="KEY=V1,V2,...",
+                        help="Values of a dotted settings key, e.g. maneuver_calculation.safe_diverg_dist=1,1.5,2")
+    parser.add_argument("--random", type=str, action='append', default=[], metavar="KEY=LOW:HIGH",
+                        help="Range of a dotted settings key to sample uniformly")
+    parser.add_argument("--samples", type=int, default=10, help="Number of random samples")
+    parser.add_argument("--seed", type=int, help="Random seed")
+    parser.add_argument("--workers", type=int, help="Number of concurrent runs")
+    parser.add_argument("--rvo", action="store_true", help="Run USV with --rvo")
+    parser.add_argument("--no-rvo", action="store_true", help="Run USV with --no-rvo")
+    parser.add_argument("--keep", type=str, help="Directory to keep variant directories in")
+    parser.add_argument("--output", type=str, help="CSV file for results, stdout by default")
+    args = parser.parse_args()
+
+    variants = grid(parse_space(args.grid, ','))
+    if args.random:
+        ranges = {key: tuple(values) for key, values in parse_space(args.random, ':').items()}
+        # Random keys are sampled once and every sample is crossed with every grid point
+        samples = random_sample(ranges, args.samples, args.seed)
+        variants = [dict(point, **sample) for point in variants for sample in samples]
+
+    runner = Runner(os.path.abspath(args.executable))
+    results = sweep(runner, find_cases(args.cases), variants, args.keep, max_workers=args.workers,
+                    rvo=args.rvo, no_rvo=args.no_rvo)
+    keys = list(variants[0]) if variants else []
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as f:
+            write_csv(results, f, keys)
+    else:
+        write_csv(results, sys.stdout, keys)
@@ -0,0 +1,113 @@
+import io
+import json
+import mmap
+import os
+import struct
+
+from simulator.data import is_case
+
+# File starts with magic and length of JSON header, then blobs of files follow
+MAGIC = b'KTVZPAK1'
+PREFIX = struct.Struct('<8sQ')
+
+
+def pack(root, filename):
+    """
+    Packs every case under root into a single archive file
+    :param root: root of case tree
+    :param filename: archive file
+    :return: number of packed cases
+    """
+    root = os.path.abspath(root)
+    cases, sources, offset = {}, [], 0
+    for directory, dirs, files in os.walk(root):
+        if not is_case(files):
+            continue
+        case = os.path.relpath(directory, root).replace(os.sep, '/')
+        cases[case] = {}
+        for name in sorted(files):
+            if name.endswith('.json'):
+                size = os.path.getsize(os.path.join(directory, name))
+                cases[case][name] = [offset, size]
+                sources.append((os.path.join(directory, name), size))
+                offset += size
+
+    header = json.dumps({'cases': cases}).encode('utf-8')
+    with open(filename, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        for source, size in sources:
+            with open(source, 'rb') as source_file:
+                data = source_file.read()
+            if len(data) != size:
+                raise IOError('{} changed while packing'.format(source))
+            f.write(data)
+    return len(cases)
+
+
+def unpack(filename, root):
+    """
+    Extracts every case of an archive into a case tree
+    :param filename: archive file
+    :param root: root of case tree
+    """
+    with Archive(filename) as archive:
+        for case in archive.cases():
+            archive.extract(case, os.path.join(root, *case.split('/')))
+
+
+class Archive:
+    """
+    Read access to a packed archive through memory mapping
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = PREFIX.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('{} is not a scenario archive'.format(filename))
+        self._data_offset = PREFIX.size + header_size
+        self._cases = json.loads(self._map[PREFIX.size:self._data_offset].decode('utf-8'))['cases']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def cases(self):
+        return list(self._cases)
+
+    def files(self, case):
+        return list(self._cases[case])
+
+    def read(self, case, name):
+        """
+        :return: content of a case file, bytes
+        """
+        offset, size = self._cases[case][name]
+        return self._map[self._data_offset + offset:self._data_offset + offset + size]
+
+    def open(self, case, name):
+        """
+        :return: text file object with content of a case file
+        """
+        return io.TextIOWrapper(io.BytesIO(self.read(case, name)), encoding='utf-8')
+
+    def extract(self, case, directory):
+        """
+        Writes files of a case into a directory
+        :param case: name of case
+        :param directory: target directory, created if needed
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self._cases[case]:
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(self.read(case, name))
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from simulator.path import Path
+
+# Sidecar file with parsed data, kept next to the source files
+CACHE_FILE = '.ktviz-cache.npz'
+
+# Solver options naming input and output files
+INPUT_OPTIONS = ('--targets', '--settings', '--nav-data', '--hydrometeo', '--constraints', '--route')
+OUTPUT_OPTIONS = ('--maneuver', '--analyse', '--predict')
+
+
+def _stamp(directory, filenames):
+    stamp = []
+    for filename in filenames:
+        try:
+            stat = os.stat(os.path.join(directory, filename))
+            stamp.append([filename, stat.st_mtime_ns, stat.st_size])
+        except (OSError, TypeError):
+            stamp.append([filename, None, None])
+    return json.dumps(stamp)
+
+
+def load_cached(directory, key, filenames):
+    """
+    Loads an entry from the cache of a directory
+    :param directory: directory with source files
+    :param key: name of entry
+    :param filenames: source files of entry, the entry is valid while their mtime and size are unchanged
+    :return: dict of arrays, or None if there is no valid entry
+    """
+    try:
+        archive = np.load(os.path.join(directory, CACHE_FILE), allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    with archive:
+        prefix = key + '|'
+        if prefix + 'stamp' not in archive.files or str(archive[prefix + 'stamp']) != _stamp(directory, filenames):
+            return None
+        return {name[len(prefix):]: archive[name] for name in archive.files
+                if name.startswith(prefix) and name != prefix + 'stamp'}
+
+
+def save_cached(directory, key, filenames, arrays):
+    """
+    Saves an entry to the cache of a directory, other entries are kept
+    :param directory: directory with source files
+    :param key: name of entry
+    :param filenames: source files of entry
+    :param arrays: dict of arrays to store
+    """
+    filename = os.path.join(directory, CACHE_FILE)
+    prefix = key + '|'
+    entries = {}
+    try:
+        with np.load(filename, allow_pickle=False) as archive:
+            entries = {name: archive[name] for name in archive.files if not name.startswith(prefix)}
+    except (OSError, ValueError):
+        pass
+    entries.update({prefix + name: value for name, value in arrays.items()})
+    entries[prefix + 'stamp'] = np.array(_stamp(directory, filenames))
+
+    # Write to a temporary file first, so readers never see a partial cache
+    tmp_filename = filename + '.tmp'
+    try:
+        with open(tmp_filename, 'wb') as f:
+            np.savez_compressed(f, **entries)
+        os.replace(tmp_filename, filename)
+    except OSError:
+        # Cache is optional, read-only directories just stay uncached
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+
+
+def pack_paths(paths):
+    """
+    Packs a list of paths into arrays
+    :param paths: list of Path
+    :return: dict with concatenated segments, segment counts and start times
+    """
+    return {'segments': np.concatenate([path.segments for path in paths]) if paths else np.zeros(0),
+            'counts': np.array([len(path.segments) for path in paths], dtype=np.int64),
+            'start_times': np.array([np.nan if path.start_time is None else path.start_time for path in paths])}
+
+
+def unpack_paths(arrays):
+    """
+    Reverse of pack_paths
+    :param arrays: dict from pack_paths
+    :return: list of Path
+    """
+    segments = np.split(arrays['segments'], np.cumsum(arrays['counts'])[:-1]) if len(arrays['counts']) else []
+    return [Path.from_segments(segment, None if np.isnan(start_time) else start_time.item())
+            for segment, start_time in zip(segments, arrays['start_times'])]
+
+
+def _option_values(args, options):
+    return [args[args.index(option) + 1] if option in args else None for option in options]
+
+
+class ResultCache:
+    """
+    Content-addressed cache of solver runs. Entry key is a hash of solver executable,
+    command line, input files and environment overrides, so it stays valid while none of them changes.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._executables = {}
+
+    def _hash_executable(self, executable):
+        filename = executable if os.path.isfile(executable) else shutil.which(executable)
+        if filename is None:
+            return executable
+        stat = os.stat(filename)
+        stamp = (os.path.realpath(filename), stat.st_mtime_ns, stat.st_size)
+        if stamp not in self._executables:
+            digest = hashlib.sha256()
+            with open(filename, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            self._executables[stamp] = digest.hexdigest()
+        return self._executables[stamp]
+
+    def key(self, args, directory, env=None):
+        """
+        :param args: solver command line
+        :param directory: working directory of solver
+        :param env: environment variables overridden for the run
+        :return: key of run
+        """
+        digest = hashlib.sha256()
+        digest.update(self._hash_executable(args[0]).encode())
+        digest.update(json.dumps([[arg for arg in args[1:] if arg], sorted((env or {}).items())]).encode())
+        for filename in _option_values(args, INPUT_OPTIONS):
+            try:
+                with open(os.path.join(directory, filename), 'rb') as f:
+                    data = f.read()
+            except (OSError, TypeError):
+                digest.update(b'-')
+                continue
+            digest.update(str(len(data)).encode() + b':' + data)
+        return digest.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def restore(self, key, args, directory):
+        """
+        Restores output files of a cached run into directory
+        :return: stdout, return code, execution time and resource usage of cached run,
+        or None if there is no entry
+        """
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, 'result.json')) as f:
+                result = json.load(f)
+            with open(os.path.join(entry, 'stdout'), 'rb') as f:
+                stdout = f.read()
+        except (OSError, ValueError):
+            return None
+        for i, filename in enumerate(_option_values(args, OUTPUT_OPTIONS)):
+            if filename is None:
+                continue
+            target = os.path.join(directory, filename)
+            if os.path.isfile(os.path.join(entry, str(i))):
+                shutil.copyfile(os.path.join(entry, str(i)), target)
+            elif os.path.exists(target):
+                # Solver did not write this output, stale one must not be taken for result
+                os.remove(target)
+        return stdout, result['return_code'], result['exec_time'], result.get('usage')
+
+    def store(self, key, args, directory, stdout, return_code, exec_time, usage=None):
+        """
+        Stores output files of a finished run from directory
+        :param usage: resource usage of run as a sequence of numbers, if known
+        """
+        os.makedirs(os.path.dirname(self._entry(key)), exist_ok=True)
+        # Entry is assembled aside and renamed, so readers never see a partial one
+        tmp_entry = tempfile.mkdtemp(dir=os.path.dirname(self._entry(key)))
+        try:
+            for i, filename in enumerate(_option_values(args, OUTPUT_OPTIONS)):
+                if filename is not None and os.path.isfile(os.path.join(directory, filename)):
+                    shutil.copyfile(os.path.join(directory, filename), os.path.join(tmp_entry, str(i)))
+            with open(os.path.join(tmp_entry, 'stdout'), 'wb') as f:
+                f.write(stdout)
+            with open(os.path.join(tmp_entry, 'result.json'), 'w') as f:
+                json.dump({'return_code': return_code, 'exec_time': exec_time,
+                           'usage': list(usage) if usage is not None else None}, f)
+            os.rename(tmp_entry, self._entry(key))
+        except OSError:
+            # Entry exists already, e.g. stored by a concurrent run
+            shutil.rmtree(tmp_entry, ignore_errors=True)
@@ -0,0 +1,86 @@
+from collections import deque
+
+# Default number of first and last lines of output kept in memory
+HEAD_LINES = 1000
+TAIL_LINES = 1000
+
+
+class Capture:
+    """
+    Bounded capture of process output. Only first and last lines are kept in memory,
+    the whole output is optionally written to a log file.
+    """
+
+    def __init__(self, log_file=None, on_line=None, head_lines=HEAD_LINES, tail_lines=TAIL_LINES,
+                 max_line=1 << 16):
+        """
+        :param log_file: file name to write the whole output to
+        :param on_line: function called with every line, without line end, e.g. to parse progress markers
+        :param head_lines: number of first lines to keep
+        :param tail_lines: number of last lines to keep
+        :param max_line: longer lines are split, bytes
+        """
+        self.log_file = log_file
+        self.on_line = on_line
+        self.head_lines = head_lines
+        self.max_line = max_line
+        self.head = []
+        self.tail = deque(maxlen=tail_lines)
+        self.lines = 0
+        self._partial = b''
+        self._log = open(log_file, 'wb') if log_file is not None else None
+
+    def write(self, data):
+        """
+        Adds a chunk of output
+        :param data: bytes
+        """
+        if self._log is not None:
+            self._log.write(data)
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        if len(self._partial) > self.max_line:
+            lines.append(self._partial)
+            self._partial = b''
+        self._add(lines)
+
+    def _add(self, lines):
+        if self.on_line is not None:
+            for line in lines:
+                self.on_line(line)
+        self.lines += len(lines)
+        free = self.head_lines - len(self.head)
+        if free > 0:
+            self.head.extend(lines[:free])
+            lines = lines[free:]
+        if self.tail.maxlen:
+            self.tail.extend(lines[-self.tail.maxlen:])
+
+    def close(self):
+        """
+        Flushes the last line without line end and closes log file
+        """
+        if self._partial:
+            self._add([self._partial])
+            self._partial = b''
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def skipped(self):
+        """
+        :return: number of lines which are only in log file
+        """
+        return self.lines - len(self.head) - len(self.tail)
+
+    def getvalue(self):
+        """
+        :return: kept output as bytes, with a marker in place of skipped lines
+        """
+        lines = list(self.head)
+        if self.skipped():
+            lines.append('... {} lines skipped ...'.format(self.skipped()).encode())
+        lines.extend(self.tail)
+        if self._partial:
+            lines.append(self._partial)
+        return b'\n'.join(lines) + (b'\n' if lines and not self._partial else b'')
@@ -0,0 +1,123 @@
+import csv
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .geodesy import Frame
+from .data import ScenarioData
+from .sweep import find_cases
+
+# Differences of solution B from solution A: divergence in miles, deltas and ratio are B - A and B / A.
+# Values are None where either side has no solution or no execution time.
+Comparison = namedtuple('Comparison', ['case', 'return_code_a', 'return_code_b', 'max_divergence',
+                                       'divergence_time', 'duration_delta', 'segment_delta', 'exec_time_ratio',
+                                       'flagged'])
+Thresholds = namedtuple('Thresholds', ['max_divergence', 'max_duration_delta', 'max_exec_time_ratio'])
+
+
+def compare_paths(path_a, path_b, step=1.):
+    """
+    Numeric difference of two paths
+    :param step: sampling step of common time span, seconds
+    :return: maximal distance between positions at the same time (miles, NaN when paths do not overlap in time)
+    and its time, difference of durations, difference of segment counts
+    """
+    times_a, times_b = path_a.segment_times(), path_b.segment_times()
+    begin, end = max(times_a[0], times_b[0]), min(times_a[-1], times_b[-1])
+    max_divergence, divergence_time = math.nan, math.nan
+    if begin < end:
+        # Path end is outside of path, the last sample is taken just before it
+        times = np.append(np.arange(begin, end, step), np.nextafter(end, begin))
+        a, b = path_a.positions(times, fast=True), path_b.positions(times, fast=True)
+        frame = Frame(float(path_a.segments['lat'][0]), float(path_a.segments['lon'][0]))
+        xa, ya = frame.from_wgs_array(a.lat, a.lon)
+        xb, yb = frame.from_wgs_array(b.lat, b.lon)
+        distance = np.hypot(xb - xa, yb - ya)
+        if not np.isnan(distance).all():
+            i = int(np.nanargmax(distance))
+            max_divergence, divergence_time = float(distance[i]), float(times[i])
+    duration_delta = float((times_b[-1] - times_b[0]) - (times_a[-1] - times_a[0]))
+    return max_divergence, divergence_time, duration_delta, len(path_b.segments) - len(path_a.segments)
+
+
+def compare(case, data_a, data_b, return_codes=(None, None), exec_times=(None, None), thresholds=None, step=1.):
+    """
+    Compares first solutions of two solver results on a case
+    :param data_a: ScenarioData with result A
+    :param data_b: ScenarioData with result B
+    :param thresholds: Thresholds to flag the case, flagged also when only one side has a solution
+    or return codes differ
+    :return: Comparison
+    """
+    max_divergence = divergence_time = duration_delta = segment_delta = None
+    has_a, has_b = bool(data_a.maneuver), bool(data_b.maneuver)
+    if has_a and has_b:
+        max_divergence, divergence_time, duration_delta, segment_delta = \
+            compare_paths(data_a.maneuver[0].path, data_b.maneuver[0].path, step)
+        if math.isnan(max_divergence):
+            max_divergence = divergence_time = None
+    exec_time_ratio = None
+    if exec_times[0] and exec_times[1] is not None:
+        exec_time_ratio = exec_times[1] / exec_times[0]
+
+    flagged = has_a != has_b or return_codes[0] != return_codes[1]
+    if thresholds is not None:
+        flagged |= any(value is not None and limit is not None and value > limit
+                       for value, limit in ((max_divergence, thresholds.max_divergence),
+                                            (None if duration_delta is None else abs(duration_delta),
+                                             thresholds.max_duration_delta),
+                                            (exec_time_ratio, thresholds.max_exec_time_ratio)))
+    return Comparison(case, return_codes[0], return_codes[1], max_divergence, divergence_time, duration_delta,
+                      segment_delta, exec_time_ratio, flagged)
+
+
+def compare_runs(runner_a, runner_b, cases, max_workers=None, thresholds=None, step=1., **kwargs):
+    """
+    Runs two solvers on every case concurrently, cases are run in workspaces and are not written
+    :param runner_a: simulator.runner.Runner of solver A
+    :param runner_b: simulator.runner.Runner of solver B
+    :param cases: list of case directories
+    :param max_workers: maximal number of concurrent runs, by default number of cpus
+    :param kwargs: arguments of Runner.run_directory
+    :return: generator of Comparison in order of cases
+    """
+    with ThreadPoolExecutor(max_workers or os.cpu_count()) as executor:
+        futures = [(case, executor.submit(runner_a.run_isolated, case, **kwargs),
+                    executor.submit(runner_b.run_isolated, case, **kwargs)) for case in cases]
+        try:
+            for case, future_a, future_b in futures:
+                a, b = future_a.result(), future_b.result()
+                yield compare(case, a.data, b.data, (a.return_code, b.return_code), (a.exec_time, b.exec_time),
+                              thresholds, step)
+        finally:
+            for _, future_a, future_b in futures:
+                future_a.cancel()
+                future_b.cancel()
+
+
+def compare_trees(root_a, root_b, max_workers=None, thresholds=None, step=1.):
+    """
+    Compares maneuvers of two result trees with the same layout, cases are taken from tree A
+    :return: generator of Comparison in order of cases
+    """
+    def load(directory):
+        return ScenarioData.load_directory(directory, targets=None, settings=None, nav_data=None, hydrometeo=None,
+                                           constraints=None, route=None, analyse=None, predict=None)
+
+    def run(case):
+        directory_b = os.path.join(root_b, os.path.relpath(case, root_a))
+        return compare(os.path.relpath(case, root_a), load(case), load(directory_b), thresholds=thresholds,
+                       step=step)
+
+    with ThreadPoolExecutor(max_workers or os.cpu_count()) as executor:
+        yield from executor.map(run, find_cases([root_a]))
+
+
+def write_csv(comparisons, f):
+    writer = csv.writer(f)
+    writer.writerow(Comparison._fields)
+    for comparison in comparisons:
+        writer.writerow(comparison)
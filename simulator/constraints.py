@@ -0,0 +1,237 @@
+import json
+import math
+from collections import defaultdict, namedtuple
+
+import numpy as np
+
+Violation = namedtuple('Violation', ['feature', 'limitation_type', 'begin', 'end'])
+
+
+def _intervals(times, mask):
+    """
+    Converts a mask over samples into (begin, end) time intervals of its runs
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts, stops = np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]
+    return [(float(times[start]), float(times[stop - 1])) for start, stop in zip(starts, stops)]
+
+
+def _inside(x, y, polygon):
+    """
+    Ray casting test of points against a polygon ring, vectorized over points and edges
+    """
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    px, py = x[:, None], y[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+    return np.count_nonzero(crossing, axis=1) % 2 == 1
+
+
+def _crossing(x, y, line):
+    """
+    Finds steps between consecutive points which cross a polyline
+    :return: mask over steps
+    """
+    ax, ay, bx, by = x[:-1, None], y[:-1, None], x[1:, None], y[1:, None]
+    cx, cy, dx, dy = line[:-1, 0], line[:-1, 1], line[1:, 0], line[1:, 1]
+
+    def side(px, py, qx, qy, rx, ry):
+        return np.sign((qx - px) * (ry - py) - (qy - py) * (rx - px))
+
+    return ((side(ax, ay, bx, by, cx, cy) != side(ax, ay, bx, by, dx, dy)) &
+            (side(cx, cy, dx, dy, ax, ay) != side(cx, cy, dx, dy, bx, by))).any(axis=1)
+
+
+class Constraints:
+    """
+    Constraints GeoJSON projected into a scenario frame once, with a uniform
+    grid over feature bounding boxes for fast proximity queries
+    """
+
+    def __init__(self, data, frame, cell_size=None):
+        """
+        :param data: constraints GeoJSON feature collection
+        :param frame: simulator.geodesy.Frame to project into
+        :param cell_size: size of grid cell, miles; by default chosen from extent and number of features
+        """
+        self.frame = frame
+        self.features = [] if data is None else data['features']
+
+        # GeoJSON uses lon, lat notation. All coordinates are projected in a single call.
+        rings = [np.asarray(Constraints._coordinates(feature), dtype=float).reshape(-1, 2)
+                 for feature in self.features]
+        sizes = [len(ring) for ring in rings]
+        lonlat = np.concatenate(rings) if rings else np.empty((0, 2))
+        x, y = frame.from_wgs_array(lonlat[:, 1], lonlat[:, 0])
+        self.geometries = np.split(np.column_stack((x, y)), np.cumsum(sizes)[:-1]) if rings else []
+
+        self.bounds = np.empty((len(self.features), 4))
+        for i, (feature, geometry) in enumerate(zip(self.features, self.geometries)):
+            buffer = feature['properties'].get('distance', 0) if feature['geometry']['type'] == 'Point' else 0
+            self.bounds[i, :2] = geometry.min(axis=0) - buffer
+            self.bounds[i, 2:] = geometry.max(axis=0) + buffer
+
+        if cell_size is None:
+            cell_size = 1.
+            if len(self.features):
+                extent = (self.bounds[:, 2:].max(axis=0) - self.bounds[:, :2].min(axis=0)).max()
+                cell_size = max(extent / math.sqrt(len(self.features)), 1e-3)
+        self.cell_size = cell_size
+        self.grid = defaultdict(list)
+        for i, (x_min, y_min, x_max, y_max) in enumerate(self._cells(self.bounds)):
+            for cell_x in range(x_min, x_max + 1):
+                for cell_y in range(y_min, y_max + 1):
+                    self.grid[cell_x, cell_y].append(i)
+        # Cell range of occupied cells, queries are clipped to it
+        cells = np.array(list(self.grid), dtype=int).reshape(-1, 2)
+        self.occupied = (tuple(cells.min(axis=0).tolist()) + tuple(cells.max(axis=0).tolist())) if len(cells) else None
+
+    @staticmethod
+    def load(filename, frame, cell_size=None):
+        """
+        Loads constraints from file
+        :param filename: constraints GeoJSON file
+        :param frame: simulator.geodesy.Frame to project into
+        :param cell_size: size of grid cell, miles
+        :return: Constraints
+        """
+        with open(filename) as f:
+            return Constraints(json.loads(f.read()), frame, cell_size)
+
+    @staticmethod
+    def _coordinates(feature):
+        coords = feature['geometry']['coordinates']
+        if feature['geometry']['type'] == 'Polygon':
+            # Exterior ring only
+            return coords[0]
+        return coords
+
+    def _cells(self, bounds):
+        return np.floor(np.atleast_2d(bounds) / self.cell_size).astype(int).tolist()
+
+    def query(self, x_min, y_min, x_max, y_max):
+        """
+        Finds features whose bounding box (including point distance) intersects given box
+        :return: sorted list of feature indices
+        """
+        if self.occupied is None:
+            return []
+        (cell_x_min, cell_y_min, cell_x_max, cell_y_max), = self._cells((x_min, y_min, x_max, y_max))
+        cell_x_min, cell_y_min = max(cell_x_min, self.occupied[0]), max(cell_y_min, self.occupied[1])
+        cell_x_max, cell_y_max = min(cell_x_max, self.occupied[2]), min(cell_y_max, self.occupied[3])
+        if cell_x_min > cell_x_max or cell_y_min > cell_y_max:
+            return []
+        candidates = set()
+        if (cell_x_max - cell_x_min + 1) * (cell_y_max - cell_y_min + 1) > len(self.grid):
+            # Box covers more cells than there are occupied ones
+            for (cell_x, cell_y), features in self.grid.items():
+                if cell_x_min <= cell_x <= cell_x_max and cell_y_min <= cell_y <= cell_y_max:
+                    candidates.update(features)
+        else:
+            for cell_x in range(cell_x_min, cell_x_max + 1):
+                for cell_y in range(cell_y_min, cell_y_max + 1):
+                    candidates.update(self.grid.get((cell_x, cell_y), ()))
+        candidates = np.fromiter(candidates, dtype=int, count=len(candidates))
+        bounds = self.bounds[candidates]
+        hit = (bounds[:, 0] <= x_max) & (bounds[:, 2] >= x_min) & (bounds[:, 1] <= y_max) & (bounds[:, 3] >= y_min)
+        return sorted(candidates[hit].tolist())
+
+    def near_path(self, path, begin=None, end=None, margin=0.):
+        """
+        Finds features which a path comes near within a time window
+        :param path: Path
+        :param begin: start of time window, path start by default
+        :param end: end of time window, path end by default
+        :param margin: extra distance around path, miles
+        :return: sorted list of feature indices
+        """
+        times = path.segment_times()
+        begin = times[0] if begin is None else max(begin, times[0])
+        end = times[-1] if end is None else min(end, times[-1])
+        if begin >= end:
+            return []
+        lat, lon = [], []
+        for vertex in path.iter_polyline(fast=True):
+            if vertex.time >= end:
+                break
+            if vertex.time > begin:
+                lat.append(vertex.lat)
+                lon.append(vertex.lon)
+        # Window edges, the end of path itself is not inside of it
+        edges = path.positions(np.array([begin, np.nextafter(end, begin)]), fast=True)
+        lat = np.concatenate(([edges.lat[0]], lat, [edges.lat[1]]))
+        lon = np.concatenate(([edges.lon[0]], lon, [edges.lon[1]]))
+        x, y = self.frame.from_wgs_array(lat, lon)
+        found = set()
+        # Query every polyline edge separately in cell sized pieces, one box around
+        # a long curved path or a long diagonal leg covers too much
+        for i in range(len(x) - 1):
+            pieces = max(1, int(math.ceil(math.hypot(x[i + 1] - x[i], y[i + 1] - y[i]) / self.cell_size)))
+            px = np.linspace(x[i], x[i + 1], pieces + 1)
+            py = np.linspace(y[i], y[i + 1], pieces + 1)
+            for j in range(pieces):
+                found.update(self.query(min(px[j], px[j + 1]) - margin, min(py[j], py[j + 1]) - margin,
+                                        max(px[j], px[j + 1]) + margin, max(py[j], py[j + 1]) + margin))
+        return sorted(found)
+
+    def check_path(self, path, step=1.):
+        """
+        Finds every time interval where a path violates constraints: inside of
+        zone_entering_prohibition, outside of zone_leaving_prohibition, closer than
+        distance to point_approach_prohibition, crossing line_crossing_prohibition,
+        or out of min_course/max_course/max_speed in movement_parameters_limitation
+        :param path: Path
+        :param step: sampling step, seconds
+        :return: list of Violation sorted by begin time
+        """
+        times = path.segment_times()
+        times = np.arange(times[0], times[-1], step)
+        position = path.positions(times, fast=True)
+        x, y = self.frame.from_wgs_array(position.lat, position.lon)
+        speed = position.speed * 3600  # [knots]
+
+        # Leaving prohibitions are violated far away from their zones, so they are always checked
+        candidates = set(self.near_path(path))
+        candidates.update(i for i, feature in enumerate(self.features)
+                          if feature['properties'].get('limitation_type') == 'zone_leaving_prohibition')
+
+        violations = []
+        for i in sorted(candidates):
+            feature, geometry = self.features[i], self.geometries[i]
+            limitation = feature['properties'].get('limitation_type')
+            kind = feature['geometry']['type']
+            x_min, y_min, x_max, y_max = self.bounds[i]
+            near = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+
+            if kind == 'Polygon' and limitation in ('zone_entering_prohibition', 'zone_leaving_prohibition',
+                                                    'movement_parameters_limitation'):
+                inside = np.zeros(len(times), dtype=bool)
+                inside[near] = _inside(x[near], y[near], geometry)
+                if limitation == 'zone_entering_prohibition':
+                    mask = inside
+                elif limitation == 'zone_leaving_prohibition':
+                    mask = ~inside
+                else:
+                    properties = feature['properties']
+                    wrong = np.zeros(len(times), dtype=bool)
+                    if 'min_course' in properties and 'max_course' in properties:
+                        # Allowed sector goes clockwise from min_course to max_course
+                        sector = (properties['max_course'] - properties['min_course']) % 360
+                        wrong |= (position.course - properties['min_course']) % 360 > sector
+                    if 'max_speed' in properties:
+                        wrong |= speed > properties['max_speed']
+                    mask = inside & wrong
+                spans = _intervals(times, mask)
+            elif kind == 'Point' and limitation == 'point_approach_prohibition':
+                mask = np.zeros(len(times), dtype=bool)
+                mask[near] = np.hypot(x[near] - geometry[0, 0], y[near] - geometry[0, 1]) \
+                    < feature['properties']['distance']
+                spans = _intervals(times, mask)
+            elif kind == 'LineString' and limitation == 'line_crossing_prohibition':
+                steps = _crossing(x, y, geometry) if len(times) > 1 else np.zeros(0, dtype=bool)
+                spans = [(float(times[j]), float(times[j + 1])) for j in np.nonzero(steps)[0]]
+            else:
+                continue
+            violations.extend(Violation(i, limitation, begin, end) for begin, end in spans)
+        return sorted(violations, key=lambda violation: violation.begin)
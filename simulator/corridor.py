@@ -0,0 +1,95 @@
+from collections import namedtuple
+
+import numpy as np
+
+Deviation = namedtuple('Deviation', ['times', 'cross_track', 'segment', 'outside', 'excursions'])
+Excursion = namedtuple('Excursion', ['begin', 'end', 'max_deviation'])
+
+# Number of sample and edge pairs processed at once by Corridor.deviation
+CHUNK_ELEMENTS = 1 << 16
+
+
+class Corridor:
+    """
+    Route corridor built from port_dev and starboard_dev of route segments
+    """
+
+    def __init__(self, route, frame, max_error_m=10.):
+        """
+        :param route: route Path
+        :param frame: simulator.geodesy.Frame to work in
+        :param max_error_m: maximal error of route polyline on arcs, meters
+        """
+        self.frame = frame
+        vertices = list(route.iter_polyline(max_error_m))
+        times = np.array([vertex.time for vertex in vertices])
+        x, y = frame.from_wgs_array(np.array([vertex.lat for vertex in vertices]),
+                                    np.array([vertex.lon for vertex in vertices]))
+        self.points = np.column_stack((x, y))
+        # Every polyline edge belongs to the segment its first vertex lies on
+        self.segment = np.clip(np.searchsorted(route.segment_times(), times[:-1], side='right') - 1,
+                               0, len(route.segments) - 1)
+        self.port_dev = route.segments['port_dev'][self.segment]
+        self.starboard_dev = route.segments['starboard_dev'][self.segment]
+
+    def polygon(self):
+        """
+        Corridor outline: port side forward, then starboard side backward
+        :return: array of x, y vertices
+        """
+        a, b = self.points[:-1], self.points[1:]
+        direction = b - a
+        # Normal to starboard in frame with x to north and y to east
+        normal = np.column_stack((-direction[:, 1], direction[:, 0])) / np.hypot(*direction.T)[:, None]
+        port = np.column_stack((a - normal * self.port_dev[:, None], b - normal * self.port_dev[:, None]))
+        starboard = np.column_stack((a + normal * self.starboard_dev[:, None],
+                                     b + normal * self.starboard_dev[:, None]))
+        return np.concatenate((port.reshape(-1, 2), starboard.reshape(-1, 2)[::-1]))
+
+    def _nearest(self, px, py):
+        # Signed distance to the nearest polyline edge and its index for every point
+        p = np.column_stack((px, py))[:, None, :]
+        a, b = self.points[None, :-1], self.points[None, 1:]
+        direction = b - a
+        length2 = (direction ** 2).sum(axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = np.clip(np.where(length2 > 0, ((p - a) * direction).sum(axis=2) / length2, 0), 0, 1)
+        offset = p - (a + u[..., None] * direction)
+        distance = np.hypot(offset[..., 0], offset[..., 1])
+        nearest = np.argmin(distance, axis=1)
+        rows = np.arange(len(px))
+        side = np.sign(direction[0, nearest, 0] * offset[rows, nearest, 1] -
+                       direction[0, nearest, 1] * offset[rows, nearest, 0])
+        return np.where(side < 0, -1, 1) * distance[rows, nearest], nearest
+
+    def deviation(self, path, step=1., max_route_deviation=None):
+        """
+        Signed cross-track deviation of a path from the route, positive to starboard,
+        and excursions beyond the corridor or max_route_deviation
+        :param path: Path
+        :param step: sampling step, seconds
+        :param max_route_deviation: maximal allowed deviation, miles
+        :return: Deviation with per sample times, cross_track, route segment index and outside mask,
+        and list of Excursion
+        """
+        times = path.segment_times()
+        times = np.arange(times[0], times[-1], step)
+        position = path.positions(times, fast=True)
+        px, py = self.frame.from_wgs_array(position.lat, position.lon)
+        cross_track = np.empty(len(times))
+        nearest = np.empty(len(times), dtype=np.intp)
+        # Samples are matched against all edges in chunks, so memory does not grow with samples times edges
+        chunk = max(1, CHUNK_ELEMENTS // max(1, len(self.points) - 1))
+        for start in range(0, len(times), chunk):
+            cross_track[start:start + chunk], nearest[start:start + chunk] = \
+                self._nearest(px[start:start + chunk], py[start:start + chunk])
+
+        outside = (cross_track > self.starboard_dev[nearest]) | (-cross_track > self.port_dev[nearest])
+        if max_route_deviation is not None:
+            outside |= np.abs(cross_track) > max_route_deviation
+
+        edges = np.diff(np.concatenate(([0], outside.astype(np.int8), [0])))
+        excursions = [Excursion(float(times[start]), float(times[stop - 1]),
+                                float(np.abs(cross_track[start:stop]).max()))
+                      for start, stop in zip(np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0])]
+        return Deviation(times, cross_track, self.segment[nearest], outside, excursions)
@@ -0,0 +1,105 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+from geographiclib.geodesic import Geodesic
+
+from .geodesy import Frame
+
+Approach = namedtuple('Approach', ['distance', 'time'])
+
+# Maximal turn between samples when bracketing the minimum on arcs
+ARC_STEP = math.radians(10)
+# Maximal distance run by a ship within one planar step, miles
+MAX_STEP = 2.
+
+
+def _distance(positions, time):
+    position1, position2 = positions(time)
+    return Geodesic.WGS84.Inverse(position1.lat, position1.lon, position2.lat, position2.lon)['s12'] / 1852
+
+
+def _interval_approach(segment1, segment2, positions, begin, end):
+    """
+    Minimum separation of two ships within one interval, where each of
+    them stays on a single segment
+    :param positions: function of timestamp returning Positions of both ships
+    :return: distance in miles and timestamp
+    """
+    duration = end - begin
+    travel = max(segment['speed'] * duration for segment in (segment1, segment2))
+    turn = max(abs(segment['speed'] * duration * segment['curve']) for segment in (segment1, segment2))
+
+    if segment1['curve'] == 0 and segment2['curve'] == 0:
+        # Two straight lines: CPA of constant velocities in the frame of ship 1 at the start of every step.
+        # Velocities are taken from projected positions, courses at the ships' own positions are not
+        # comparable in one frame because of meridian convergence.
+        nodes = np.linspace(begin, end, max(1, math.ceil(travel / MAX_STEP)) + 1)
+        best = math.inf, begin
+        start = positions(begin)
+        for step_begin, step_end in zip(nodes[:-1], nodes[1:]):
+            finish = positions(step_end)
+            frame = Frame(start[0].lat, start[0].lon)
+            (x1, y1), (x2, y2), (x1_end, y1_end), (x2_end, y2_end) = \
+                (frame.from_wgs(position.lat, position.lon)[:2] for position in start + finish)
+            step = step_end - step_begin
+            rx, ry = x2 - x1, y2 - y1
+            wx, wy = (x2_end - x2 - x1_end + x1) / step, (y2_end - y2 - y1_end + y1) / step
+            w2 = wx * wx + wy * wy
+            time = 0 if w2 == 0 else min(max(-(rx * wx + ry * wy) / w2, 0), step)
+            distance = math.hypot(rx + wx * time, ry + wy * time)
+            if distance < best[0]:
+                best = distance, float(step_begin + time)
+            start = finish
+        return _distance(positions, best[1]), best[1]
+
+    # Arcs: bracket the minimum on a grid fine enough to make the distance unimodal between nodes,
+    # then refine it with golden section search
+    times = np.linspace(begin, end, max(2, math.ceil(turn / ARC_STEP), math.ceil(travel / MAX_STEP)) + 1)
+    i = int(np.argmin([_distance(positions, time) for time in times]))
+    low, high = times[max(i - 1, 0)], times[min(i + 1, len(times) - 1)]
+    ratio = (math.sqrt(5) - 1) / 2
+    while high - low > 1e-3:
+        t1, t2 = high - ratio * (high - low), low + ratio * (high - low)
+        if _distance(positions, t1) < _distance(positions, t2):
+            high = t2
+        else:
+            low = t1
+    time = float((low + high) / 2)
+    return _distance(positions, time), time
+
+
+def closest_approach(path1, path2):
+    """
+    Finds the closest point of approach of two paths. Segment boundaries of
+    both paths are merged into intervals where each ship moves along one
+    segment, and every interval is solved in closed form in local frames of
+    steps of at most MAX_STEP miles (lines) or by a bounded search (arcs).
+    :param path1: Path
+    :param path2: Path
+    :return: Approach with distance in miles and timestamp, both None if paths don't overlap in time
+    """
+    times1, times2 = path1.segment_times(), path2.segment_times()
+    begin, end = max(times1[0], times2[0]), min(times1[-1], times2[-1])
+    if begin >= end:
+        return Approach(None, None)
+
+    i, _ = path1.segment_at(begin)
+    j, _ = path2.segment_at(begin)
+    best = Approach(math.inf, None)
+    time = begin
+    while time < end:
+        interval_end = min(times1[i + 1], times2[j + 1], end)
+        if interval_end > time:
+            distance, timestamp = _interval_approach(
+                path1.segments[i], path2.segments[j],
+                lambda t: (path1.segment_position(i, t - times1[i]), path2.segment_position(j, t - times2[j])),
+                time, interval_end)
+            if distance < best.distance:
+                best = Approach(distance, timestamp)
+        if interval_end >= times1[i + 1]:
+            i += 1
+        if interval_end >= times2[j + 1]:
+            j += 1
+        time = interval_end
+    return best
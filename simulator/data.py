@@ -1,7 +1,25 @@
 import json
 import os
+from collections import namedtuple
 
+import numpy as np
+
+from simulator.cache import load_cached, save_cached, pack_paths, unpack_paths
+from simulator.constraints import Constraints
+from simulator.corridor import Corridor
+from simulator.geodesy import Frame
 from simulator.path import Path
+from simulator.stream import read_paths
+
+Separations = namedtuple('Separations', ['times', 'distances', 'min_distance', 'min_time'])
+
+
+def is_case(files):
+    """
+    :param files: names of files in a directory
+    :return: True if the directory is a scenario case
+    """
+    return "nav-data.json" in files or 'navigation.json' in files
 
 
 class Solution:
@@ -12,6 +30,97 @@ class Solution:
         self.solver_name = solver_name
 
 
+def _directory_opener(directory):
+    # Opens files of a directory, None for missing ones
+    def open_file(filename):
+        if os.path.isfile(os.path.join(directory, filename)):
+            return open(os.path.join(directory, filename))
+        return None
+
+    return open_file
+
+
+def _parse_route(data):
+    return None if data is None else Path.load_from_array(data)
+
+
+def _parse_maneuver(data):
+    if data is None:
+        return None
+    return [Solution(solution['solution_type'], solution['msg'], solution['solver_name'],
+                     Path.load_from_array(solution['path'])) for solution in data]
+
+
+def _parse_targets(data):
+    return [] if data is None else data
+
+
+# Attributes of ScenarioData which are not kept as plain JSON
+PARSERS = {'route': _parse_route, 'maneuver': _parse_maneuver, 'targets': _parse_targets}
+
+
+def _parse(name, data):
+    return PARSERS[name](data) if name in PARSERS else data
+
+
+def _dump_maneuver(data):
+    return [{'solution_type': solution.solution_type, 'msg': solution.message, 'solver_name': solution.solver_name,
+             'path': solution.path.dump_to_array()} for solution in data]
+
+
+# Reverse of PARSERS and of streamed predict loading
+DUMPERS = {'route': lambda route: route.dump_to_array(), 'maneuver': _dump_maneuver,
+           'predict': lambda predict: [path.dump_to_array() for path in predict]}
+
+
+def _file_names(targets, settings, nav_data, hydrometeo, constraints, route, maneuver, analyse, predict):
+    # ScenarioData attribute name to file name
+    return {'navigational': nav_data, 'settings': settings, 'hydrometeo': hydrometeo, 'route': route,
+            'targets': targets, 'constraints': constraints, 'maneuver': maneuver, 'analyse': analyse,
+            'predict': predict}
+
+
+def _load(name, open_file, filename):
+    f = None if filename is None else open_file(filename)
+    if f is None:
+        return _parse(name, None)
+    with f:
+        if name == 'predict':
+            # Predicted tracks can be very large, they are streamed instead of being read whole
+            return list(read_paths(f))
+        return _parse(name, json.loads(f.read()))
+
+
+def _pack_scenario(data):
+    # Plain JSON goes as one string, paths as segment arrays
+    plain = {name: getattr(data, name) for name in ('navigational', 'settings', 'hydrometeo', 'targets',
+                                                    'constraints', 'analyse')}
+    plain['has_route'] = data.route is not None
+    plain['has_predict'] = data.predict is not None
+    plain['solutions'] = None if data.maneuver is None else \
+        [{'solution_type': solution.solution_type, 'msg': solution.message, 'solver_name': solution.solver_name}
+         for solution in data.maneuver]
+    arrays = {'json': np.array(json.dumps(plain))}
+    for name, paths in (('route', [data.route] if data.route is not None else []), ('predict', data.predict or []),
+                        ('maneuver', [solution.path for solution in data.maneuver or []])):
+        arrays.update({name + '.' + key: value for key, value in pack_paths(paths).items()})
+    return arrays
+
+
+def _unpack_scenario(arrays):
+    plain = json.loads(str(arrays['json']))
+    paths = {name: unpack_paths({key: arrays[name + '.' + key] for key in ('segments', 'counts', 'start_times')})
+             for name in ('route', 'predict', 'maneuver')}
+    maneuver = None
+    if plain['solutions'] is not None:
+        maneuver = [Solution(solution['solution_type'], solution['msg'], solution['solver_name'], path)
+                    for solution, path in zip(plain['solutions'], paths['maneuver'])]
+    return ScenarioData(navigational=plain['navigational'], settings=plain['settings'],
+                        hydrometeo=plain['hydrometeo'], route=paths['route'][0] if plain['has_route'] else None,
+                        targets=plain['targets'], constraints=plain['constraints'], maneuver=maneuver,
+                        analyse=plain['analyse'], predict=paths['predict'] if plain['has_predict'] else None)
+
+
 class ScenarioData:
     def __init__(self, navigational, settings, hydrometeo, route, targets=None, constraints=None, maneuver=None,
                  analyse=None, predict=None):
@@ -29,6 +138,66 @@ class ScenarioData:
 
     @staticmethod
     def load_directory(directory, targets="target-data.json",
+                       settings="settings.json",
+                       nav_data="nav-data.json",
+                       hydrometeo="hmi-data.json",
+                       constraints="constraints.json",
+                       route="route-data.json",
+                       maneuver="maneuver.json",
+                       analyse="nav-report.json",
+                       predict="target-maneuvers.json",
+                       lazy=False,
+                       cache=False):
+        """
+        Loads scenario from directory, files which are None or don't exist are skipped
+        :param lazy: load every file on first access, see LazyScenarioData
+        :param cache: reuse parsed data from the cache file in directory while sources are unchanged,
+        ignored for lazy loading
+        :return: ScenarioData
+        """
+        files = _file_names(targets, settings, nav_data, hydrometeo, constraints, route, maneuver, analyse, predict)
+        if lazy:
+            return LazyScenarioData(directory, files)
+        if cache:
+            sources = [files[name] for name in sorted(files)]
+            arrays = load_cached(directory, 'scenario', sources)
+            if arrays is not None:
+                return _unpack_scenario(arrays)
+        open_file = _directory_opener(directory)
+        data = ScenarioData(**{name: _load(name, open_file, filename)
+                               for name, filename in files.items()})
+        if cache:
+            save_cached(directory, 'scenario', sources, _pack_scenario(data))
+        return data
+
+    @staticmethod
+    def load_archive(archive, case, targets="target-data.json",
+                     settings="settings.json",
+                     nav_data="nav-data.json",
+                     hydrometeo="hmi-data.json",
+                     constraints="constraints.json",
+                     route="route-data.json",
+                     maneuver="maneuver.json",
+                     analyse="nav-report.json",
+                     predict="target-maneuvers.json",
+                     lazy=False):
+        """
+        Loads scenario from a packed archive, see simulator.archive
+        :param archive: Archive
+        :param case: name of case in archive
+        :param lazy: load every file on first access, see LazyScenarioData
+        :return: ScenarioData
+        """
+        files = _file_names(targets, settings, nav_data, hydrometeo, constraints, route, maneuver, analyse, predict)
+
+        def open_file(filename):
+            return archive.open(case, filename) if filename in archive.files(case) else None
+
+        if lazy:
+            return LazyScenarioData(None, files, open_file)
+        return ScenarioData(**{name: _load(name, open_file, filename) for name, filename in files.items()})
+
+    def dump_directory(self, directory, targets="target-data.json",
                        settings="settings.json",
                        nav_data="nav-data.json",
                        hydrometeo="hmi-data.json",
@@ -37,22 +206,134 @@ class ScenarioData:
                        maneuver="maneuver.json",
                        analyse="nav-report.json",
                        predict="target-maneuvers.json"):
-        def load_json(filename):
-            if filename is not None and os.path.isfile(os.path.join(directory, filename)):
-                with open(os.path.join(directory, filename)) as f:
-                    return json.loads(f.read())
-            return None
-
-        predict_data = load_json(predict)
-        if predict_data is not None:
-            predict_data = [Path.load_from_array(path) for path in predict_data]
-
-        maneuver_data = load_json(maneuver)
-        if maneuver_data is not None:
-            maneuver_data = [Solution(solution['solution_type'], solution['msg'], solution['solver_name'],
-                                      Path.load_from_array(solution['path'])) for solution in maneuver_data]
-
-        return ScenarioData(navigational=load_json(nav_data), settings=load_json(settings),
-                            hydrometeo=load_json(hydrometeo), route=Path.load_from_array(load_json(route)),
-                            targets=load_json(targets), constraints=load_json(constraints),
-                            maneuver=maneuver_data, analyse=load_json(analyse), predict=predict_data)
+        """
+        Writes scenario files into directory, attributes which are None or have
+        None for file name are skipped
+        :param directory: directory to write to
+        """
+        files = _file_names(targets, settings, nav_data, hydrometeo, constraints, route, maneuver, analyse, predict)
+        for name, filename in files.items():
+            if filename is None:
+                continue
+            value = getattr(self, name)
+            if value is None:
+                continue
+            with open(os.path.join(directory, filename), 'w') as f:
+                json.dump(DUMPERS[name](value) if name in DUMPERS else value, f)
+
+    def own_path(self, solution=0):
+        """
+        Own ship path: the chosen maneuver solution, or the route if there is no maneuver
+        :param solution: index of solution
+        :return: Path
+        """
+        if self.maneuver:
+            return self.maneuver[solution].path
+        return self.route
+
+    def frame(self, solution=0):
+        """
+        Local frame of the scenario, anchored at own ship position from nav-data
+        or at the start of own path
+        :param solution: index of solution
+        :return: simulator.geodesy.Frame
+        """
+        if self.navigational is not None:
+            return Frame(self.navigational['lat'], self.navigational['lon'])
+        own = self.own_path(solution)
+        return Frame(float(own.segments['lat'][0]), float(own.segments['lon'][0]))
+
+    def constraint_index(self, cell_size=None):
+        """
+        Projects constraints into the scenario frame and indexes them
+        :param cell_size: size of grid cell, miles
+        :return: Constraints
+        """
+        return Constraints(self.constraints, self.frame(), cell_size)
+
+    def violations(self, solution=0, step=1.):
+        """
+        Checks own path against constraints, see Constraints.check_path
+        :param solution: index of solution
+        :param step: sampling step, seconds
+        :return: list of Violation
+        """
+        return self.constraint_index().check_path(self.own_path(solution), step)
+
+    def route_deviation(self, solution=0, step=1.):
+        """
+        Deviation of own path from the route corridor, limited by
+        max_route_deviation from settings when it is set, see Corridor.deviation
+        :param solution: index of solution
+        :param step: sampling step, seconds
+        :return: Deviation
+        """
+        max_route_deviation = None
+        if self.settings is not None:
+            max_route_deviation = self.settings.get('maneuver_calculation', {}).get('max_route_deviation')
+        return Corridor(self.route, self.frame(solution)).deviation(self.own_path(solution), step,
+                                                                     max_route_deviation)
+
+    def separations(self, solution=0, step=1., times=None):
+        """
+        Distances between every pair of ships on a common time grid. Ship 0 is
+        own ship (see own_path), the others are predicted target tracks.
+        :param solution: index of solution
+        :param step: time step of the grid, seconds
+        :param times: timestamps to use instead of the grid over own path
+        :return: Separations with times, distances (ships x ships x times, NaN where
+        a ship has no position), per pair min_distance and its min_time (NaN on the diagonal)
+        """
+        own = self.own_path(solution)
+        paths = [own] + list(self.predict or [])
+        if times is None:
+            own_times = own.segment_times()
+            times = np.arange(own_times[0], own_times[-1], step)
+        times = np.asarray(times, dtype=float)
+
+        frame = self.frame(solution)
+        x, y = np.empty((len(paths), len(times))), np.empty((len(paths), len(times)))
+        for i, path in enumerate(paths):
+            position = path.positions(times, fast=True)
+            x[i], y[i] = frame.from_wgs_array(position.lat, position.lon)
+
+        distances = np.hypot(x[:, None, :] - x[None, :, :], y[:, None, :] - y[None, :, :])
+        filled = np.where(np.isnan(distances), np.inf, distances)
+        if len(times):
+            index = np.argmin(filled, axis=2)
+            min_distance = np.take_along_axis(filled, index[..., None], axis=2)[..., 0]
+            min_time = times[index]
+        else:
+            min_distance = np.full(distances.shape[:2], np.inf)
+            min_time = np.full(distances.shape[:2], np.nan)
+        undefined = np.isinf(min_distance) | np.eye(len(paths), dtype=bool)
+        min_distance[undefined] = np.nan
+        min_time[undefined] = np.nan
+        return Separations(times, distances, min_distance, min_time)
+
+
+class LazyScenarioData(ScenarioData):
+    """
+    ScenarioData which loads and parses every file on first access
+    to its attribute and keeps the result
+    """
+
+    def __init__(self, directory, files, open_file=None):
+        """
+        :param directory: scenario directory
+        :param files: dict of attribute name to file name
+        :param open_file: function to open a file by name, or None for missing ones;
+        files are taken from directory by default
+        """
+        self.directory = directory
+        self.files = files
+        self.open_file = _directory_opener(directory) if open_file is None else open_file
+
+    def __getattr__(self, name):
+        # Called only for attributes which are not loaded yet
+        files = self.__dict__.get('files')
+        if files is None or name not in files:
+            raise AttributeError(name)
+        value = _load(name, self.open_file, files[name])
+        setattr(self, name, value)
+        return value
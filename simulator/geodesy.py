@@ -0,0 +1,119 @@
+import math
+
+import numpy as np
+from geographiclib.geodesic import Geodesic
+
+
+def _radii(sin_lat):
+    """
+    Meridian and prime vertical radii of curvature of WGS84 ellipsoid
+    :param sin_lat: sine of latitude
+    :return: radii in meters
+    """
+    a, f = Geodesic.WGS84.a, Geodesic.WGS84.f
+    e2 = f * (2 - f)
+    w = 1 - e2 * sin_lat ** 2
+    return a * (1 - e2) / w ** 1.5, a / np.sqrt(w)
+
+
+def local_direct(lat, lon, azi, dist):
+    """
+    Fast vectorized replacement for Geodesic.WGS84.Direct near the start point.
+    Uses a sphere with the normal section radius of the ellipsoid for
+    the given azimuth and scales the result back to the meridian and
+    prime vertical radii at the start point.
+    Error against the exact geodesic grows with the square of distance:
+    below 0.3 m at 10 miles, 1.1 m at 20 miles and 7 m at 50 miles.
+    :param lat: start latitude, degrees
+    :param lon: start longitude, degrees
+    :param azi: azimuth, degrees
+    :param dist: distance, nautical miles
+    :return: latitude and longitude of the end point
+    """
+    lat, azi = np.radians(lat), np.radians(azi)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    m, n = _radii(sin_lat)
+    r = 1 / (np.cos(azi) ** 2 / m + np.sin(azi) ** 2 / n)
+    d = np.asarray(dist) * 1852 / r
+    sin_d, cos_d = np.sin(d), np.cos(d)
+    lat2 = np.arcsin(np.clip(sin_lat * cos_d + cos_lat * sin_d * np.cos(azi), -1, 1))
+    dlon = np.arctan2(np.sin(azi) * sin_d * cos_lat, cos_d - sin_lat * np.sin(lat2))
+    # Longitude is wrapped to [-180, 180) like Geodesic.Direct does
+    return np.degrees(lat + (lat2 - lat) * r / m), (lon + np.degrees(dlon * r / n) + 180) % 360 - 180
+
+
+def local_inverse(lat1, lon1, lat2, lon2):
+    """
+    Fast vectorized replacement for Geodesic.WGS84.Inverse near the start
+    point, the inverse of local_direct with the same error bounds
+    :param lat1: start latitude, degrees
+    :param lon1: start longitude, degrees
+    :param lat2: end latitude, degrees
+    :param lon2: end longitude, degrees
+    :return: azimuth in degrees and distance in nautical miles
+    """
+    lat1 = np.radians(lat1)
+    sin_lat, cos_lat = np.sin(lat1), np.cos(lat1)
+    m, n = _radii(sin_lat)
+    dlat = np.radians(lat2) - lat1
+    dlon = np.radians((np.asarray(lon2) - lon1 + 180) % 360 - 180)
+    # Normal section radius depends on azimuth, so both are refined starting from the planar estimate
+    azi = np.arctan2(dlon * n * cos_lat, dlat * m)
+    for _ in range(2):
+        r = 1 / (np.cos(azi) ** 2 / m + np.sin(azi) ** 2 / n)
+        lat_s, dlon_s = lat1 + dlat * m / r, dlon * n / r
+        azi = np.arctan2(np.sin(dlon_s) * np.cos(lat_s),
+                         cos_lat * np.sin(lat_s) - sin_lat * np.cos(lat_s) * np.cos(dlon_s))
+    hav = np.sin((lat_s - lat1) / 2) ** 2 + cos_lat * np.cos(lat_s) * np.sin(dlon_s / 2) ** 2
+    return np.degrees(azi), 2 * np.arcsin(np.sqrt(np.clip(hav, 0, 1))) * r / 1852
+
+
+class Frame:
+    def __init__(self, lat, lon):
+        self.lat = lat
+        self.lon = lon
+
+    def from_wgs(self, lat, lon):
+        """
+        Converts WGS coords to local
+        :param lat:
+        :param lon:
+        :return: x, y, distance, bearing
+        """
+        path = Geodesic.WGS84.Inverse(self.lat, self.lon, lat, lon)
+
+        angle = math.radians(path['azi1'])
+        dist = path['s12'] / 1852
+        return dist * math.cos(angle), dist * math.sin(angle), dist, angle
+
+    def to_wgs(self, x, y):
+        """
+        Converts local coords to WGS
+        :param x:
+        :param y:
+        :return: lat, lon
+        """
+        azi1 = math.degrees(math.atan2(y, x))
+        dist = (x ** 2 + y ** 2) ** .5
+        path = Geodesic.WGS84.Direct(self.lat, self.lon, azi1, dist * 1852)
+        return path['lat2'], path['lon2']
+
+    def from_wgs_array(self, lat, lon):
+        """
+        Fast vectorized version of from_wgs, see local_inverse for accuracy
+        :param lat: array of latitudes
+        :param lon: array of longitudes
+        :return: arrays x, y
+        """
+        azi, dist = local_inverse(self.lat, self.lon, lat, lon)
+        angle = np.radians(azi)
+        return dist * np.cos(angle), dist * np.sin(angle)
+
+    def to_wgs_array(self, x, y):
+        """
+        Fast vectorized version of to_wgs, see local_direct for accuracy
+        :param x: array of x
+        :param y: array of y
+        :return: arrays lat, lon
+        """
+        return local_direct(self.lat, self.lon, np.degrees(np.arctan2(y, x)), np.hypot(x, y))
@@ -1,12 +1,36 @@
 import math
 from collections import namedtuple
+from collections.abc import Sequence
+
+import numpy as np
 from geographiclib.geodesic import Geodesic
 
+from .geodesy import local_direct
+
+
+def _field(name):
+    # Segment attribute stored in path arrays
+    def get(self):
+        return float(self._path._data[name][self._index])
+
+    def set(self, value):
+        self._path._set_field(self._index, name, value)
+
+    return property(get, set)
+
 
 class Path:
     Position = namedtuple('Position', ['lat', 'lon', 'course', 'speed'])
+    Vertex = namedtuple('Vertex', ['time', 'lat', 'lon'])
+
+    # Segment fields as stored in JSON
+    FIELDS = ('lat', 'lon', 'begin_angle', 'curve', 'length', 'duration', 'starboard_dev', 'port_dev')
+    # Storage layout: JSON fields followed by per-segment constants precomputed at load time
+    DTYPE = np.dtype([(name, float) for name in FIELDS + ('speed', 'b_sin', 'b_cos', 'radius', 'sign')])
 
     class Segment:
+        __slots__ = ('lat', 'lon', 'begin_angle', 'curve', 'length', 'duration', 'starboard_dev', 'port_dev', '_line')
+
         def __init__(self, lat, lon, begin_angle, curve, length, duration, starboard_dev, port_dev):
             self.port_dev = port_dev
             self.starboard_dev = starboard_dev
@@ -16,6 +40,16 @@ class Path:
             self.begin_angle = begin_angle  # [degrees]
             self.lon = lon
             self.lat = lat
+            self._line = None
+
+        def line(self):
+            """
+            Geodesic line of a straight segment, built on the first call
+            :return: GeodesicLine
+            """
+            if self._line is None:
+                self._line = Path.geodesic_line(self.lat, self.lon, self.begin_angle)
+            return self._line
 
         def position(self, time):
             speed = self.length / self.duration
@@ -23,8 +57,8 @@ class Path:
 
             if self.curve == 0:
                 dist = length  # [miles]
-                direct = Geodesic.WGS84.Direct(self.lat, self.lon, self.begin_angle, dist * 1852)
-                return Path.Position(direct['lat2'], direct['lon2'], self.begin_angle, speed)
+                point = self.line().Position(dist * 1852, Geodesic.LATITUDE | Geodesic.LONGITUDE)
+                return Path.Position(point['lat2'], point['lon2'], self.begin_angle, speed)
             else:
                 # For arcs
                 b_cos = math.cos(math.radians(self.begin_angle))
@@ -40,29 +74,303 @@ class Path:
                 return Path.Position(direct['lat2'], direct['lon2'], self.begin_angle + sign * math.degrees(dangle),
                                      speed)
 
-    def __init__(self, start_time=None):
+        def positions(self, times):
+            """
+            Batch version of position()
+            :param times: array of times from segment start, seconds
+            :return: arrays lat, lon, course, speed
+            """
+            return Path._evaluate(Path._pack([self])[0], np.asarray(times, dtype=float),
+                                  self.line() if self.curve == 0 else None)
+
+    class SegmentView(Segment):
+        """
+        Segment of a path which reads and writes the path arrays
+        """
+        __slots__ = ('_path', '_index')
+
+        lat, lon, begin_angle, curve, length, duration, starboard_dev, port_dev = \
+            (_field(name) for name in ('lat', 'lon', 'begin_angle', 'curve', 'length', 'duration', 'starboard_dev',
+                                       'port_dev'))
+
+        def __init__(self, path, index):
+            self._path = path
+            self._index = index
+
+        def line(self):
+            return self._path._line(self._index)
+
+    class Items(Sequence):
+        """
+        Sequence of segment views of a path
+        """
+
+        def __init__(self, path):
+            self._path = path
+
+        def __len__(self):
+            return len(self._path._data)
+
+        def __getitem__(self, i):
+            if isinstance(i, slice):
+                return [self[j] for j in range(*i.indices(len(self)))]
+            if not -len(self) <= i < len(self):
+                raise IndexError('segment index out of range')
+            return Path.SegmentView(self._path, i % len(self))
+
+    def __init__(self, start_time=None, items=None):
         self.start_time = start_time
-        self.items = []
+        self.items = [] if items is None else items
+
+    @property
+    def items(self):
+        """
+        Segments of the path as views of the underlying arrays, changes of segment
+        attributes go to the path. Segments are added or removed by assigning
+        a new sequence of segments.
+        """
+        return Path.Items(self)
+
+    @items.setter
+    def items(self, items):
+        self._set_data(Path._pack(items))
+
+    def _set_field(self, i, name, value):
+        self._data[name][i] = value
+        Path._precompute(self._data[i:i + 1])
+        self._lines.pop(i, None)
+        if name == 'duration':
+            np.cumsum(self._data['duration'], out=self._starts[1:])
+
+    def _set_data(self, data):
+        self._data = data
+        # Geodesic lines of straight segments, built on first query
+        self._lines = {}
+        # Prefix sums of segment durations: starts[i] is the start of segment i, starts[-1] is the total time
+        self._starts = np.zeros(len(data) + 1)
+        np.cumsum(data['duration'], out=self._starts[1:])
+
+    @staticmethod
+    def _pack(items):
+        items = list(items)
+        data = np.zeros(len(items), dtype=Path.DTYPE)
+        for name in Path.FIELDS:
+            data[name] = [getattr(item, name) for item in items]
+        Path._precompute(data)
+        return data
+
+    @staticmethod
+    def _precompute(data):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            data['speed'] = data['length'] / data['duration']
+            data['radius'] = np.where(data['curve'] != 0, np.abs(1 / data['curve']), 0)
+        angle = np.radians(data['begin_angle'])
+        data['b_sin'], data['b_cos'] = np.sin(angle), np.cos(angle)
+        data['sign'] = np.where(data['curve'] > 0, 1, -1)
+
+    @staticmethod
+    def geodesic_line(lat, lon, azi):
+        """
+        Geodesic line which only supports positions by distance, this is
+        all straight segments need and is cheaper to build than a full line
+        :param lat: start latitude
+        :param lon: start longitude
+        :param azi: azimuth, degrees
+        :return: GeodesicLine
+        """
+        return Geodesic.WGS84.Line(lat, lon, azi, Geodesic.LATITUDE | Geodesic.LONGITUDE | Geodesic.DISTANCE_IN)
+
+    def _line(self, i):
+        line = self._lines.get(i)
+        if line is None:
+            segment = self._data[i]
+            line = Path.geodesic_line(float(segment['lat']), float(segment['lon']), float(segment['begin_angle']))
+            self._lines[i] = line
+        return line
+
+    @staticmethod
+    def _evaluate_one(segment, time, line=None):
+        # Scalar version of _evaluate(), avoids array overhead for single queries
+        lat, lon, begin_angle, curve, speed = (float(segment[name])
+                                               for name in ('lat', 'lon', 'begin_angle', 'curve', 'speed'))
+        length = speed * time  # [miles]
+
+        if curve == 0:
+            point = line.Position(length * 1852, Geodesic.LATITUDE | Geodesic.LONGITUDE)
+            return Path.Position(point['lat2'], point['lon2'], begin_angle, speed)
+        else:
+            r, sign = float(segment['radius']), float(segment['sign'])
+            dangle = abs(length * curve)
+            x_, y_ = math.sin(dangle), sign * (1 - math.cos(dangle))
+            dx = r * (x_ * segment['b_cos'] - y_ * segment['b_sin'])
+            dy = r * (x_ * segment['b_sin'] + y_ * segment['b_cos'])
+            direct = Geodesic.WGS84.Direct(lat, lon, math.degrees(math.atan2(dy, dx)), math.hypot(dx, dy) * 1852)
+            return Path.Position(direct['lat2'], direct['lon2'], begin_angle + sign * math.degrees(dangle), speed)
+
+    @staticmethod
+    def _evaluate(segment, times, line=None):
+        # Positions on a single stored segment for an array of times from its start,
+        # straight segments need their geodesic line
+        length = segment['speed'] * times  # [miles]
+
+        if segment['curve'] == 0:
+            points = [line.Position(dist * 1852, Geodesic.LATITUDE | Geodesic.LONGITUDE) for dist in length]
+            course = np.full(length.shape, segment['begin_angle'])
+        else:
+            # For arcs, offsets from the segment start are computed at once
+            dangle = np.abs(length * segment['curve'])
+            x_, y_ = np.sin(dangle), segment['sign'] * (1 - np.cos(dangle))
+            dx = segment['radius'] * (x_ * segment['b_cos'] - y_ * segment['b_sin'])
+            dy = segment['radius'] * (x_ * segment['b_sin'] + y_ * segment['b_cos'])
+            dist = np.hypot(dx, dy)
+            azi1 = np.degrees(np.arctan2(dy, dx))
+            points = [Geodesic.WGS84.Direct(segment['lat'], segment['lon'], azi, d * 1852)
+                      for azi, d in zip(azi1, dist)]
+            course = segment['begin_angle'] + segment['sign'] * np.degrees(dangle)
+
+        lat = np.array([point['lat2'] for point in points], dtype=float)
+        lon = np.array([point['lon2'] for point in points], dtype=float)
+        return lat, lon, course, np.full(length.shape, segment['speed'])
+
+    @staticmethod
+    def _evaluate_local(segments, times):
+        # Positions for arrays of segments and times from their starts, without any per-sample geodesic solve.
+        # Offsets are found in the planar frame of each segment start, then placed on the ellipsoid.
+        length = segments['speed'] * times  # [miles]
+        dangle = np.abs(length * segments['curve'])
+        arc = segments['curve'] != 0
+        # Along-track and cross-track offsets in the segment frame, straight lines are the zero curvature limit
+        x_ = np.where(arc, segments['radius'] * np.sin(dangle), length)
+        y_ = np.where(arc, segments['radius'] * segments['sign'] * (1 - np.cos(dangle)), 0)
+        dx = x_ * segments['b_cos'] - y_ * segments['b_sin']
+        dy = x_ * segments['b_sin'] + y_ * segments['b_cos']
+        lat, lon = local_direct(segments['lat'], segments['lon'], np.degrees(np.arctan2(dy, dx)), np.hypot(dx, dy))
+        course = segments['begin_angle'] + np.where(arc, segments['sign'] * np.degrees(dangle), 0)
+        return lat, lon, course, segments['speed'].copy()
 
     @staticmethod
     def load_from_array(array):
+        items = array['items']
+        data = np.zeros(len(items), dtype=Path.DTYPE)
+        for name in Path.FIELDS:
+            data[name] = [item[name] for item in items]
+        Path._precompute(data)
+
         path = Path(array['start_time'])
-        for item in array['items']:
-            path.items.append(Path.Segment(item['lat'], item['lon'], item['begin_angle'], item['curve'], item['length'],
-                                           item['duration'], item['starboard_dev'], item['port_dev']))
+        path._set_data(data)
+        return path
+
+    @staticmethod
+    def from_segments(segments, start_time=None):
+        """
+        Makes path from a structured array of segments, e.g. taken from another path
+        :param segments: array with DTYPE
+        :param start_time: start time
+        :return: Path
+        """
+        path = Path(start_time)
+        path._set_data(np.array(segments, dtype=Path.DTYPE))
         return path
 
     def dump_to_array(self):
         return {'start_time': self.start_time,
-                'items': [{'lat': item.lat, 'lon': item.lon, 'begin_angle': item.begin_angle, 'curve': item.curve,
-                           'length': item.length, 'duration': item.duration, 'starboard_dev': item.starboard_dev,
-                           'port_dev': item.port_dev} for item in self.items]}
+                'items': [dict(zip(Path.FIELDS, row)) for row in self._data[list(Path.FIELDS)].tolist()]}
+
+    @property
+    def segments(self):
+        """
+        Segments as a structured array with fields from DTYPE, not to be modified
+        """
+        return self._data
+
+    def segment_times(self):
+        """
+        :return: array of segment start timestamps, the last element is the end of the path
+        """
+        return self._starts + self.start_time
 
-    def position(self, time):
+    def segment_at(self, time):
+        """
+        Finds the segment active at given time
+        :param time: timestamp
+        :return: index of segment and time from its start, or (None, None) outside the path
+        """
         time = time - self.start_time
-        if time >= 0:
-            for item in self.items:
-                if time < item.duration:
-                    return item.position(time)
-                time -= item.duration
+        i = int(np.searchsorted(self._starts, time, side='right')) - 1
+        if 0 <= i < len(self._data):
+            return i, float(time - self._starts[i])
+        return None, None
+
+    def position(self, time, fast=False):
+        if fast:
+            return Path.Position(*(None if np.isnan(value[0]) else float(value[0])
+                                   for value in self.positions(np.array([time]), fast=True)))
+        i, time = self.segment_at(time)
+        if i is not None:
+            return self.segment_position(i, time)
         return Path.Position(None, None, None, None)
+
+    def segment_position(self, i, time):
+        """
+        Calculates position on a given segment
+        :param i: index of segment
+        :param time: time from segment start
+        :return: Position
+        """
+        segment = self._data[i]
+        return Path._evaluate_one(segment, time, self._line(i) if segment['curve'] == 0 else None)
+
+    def positions(self, times, fast=False):
+        """
+        Calculates positions for an array of timestamps. Samples are grouped
+        by segment, so every segment is prepared only once.
+        :param times: array of timestamps
+        :param fast: use planar math in a local frame at every segment start
+        instead of exact geodesics, see simulator.geodesy.local_direct for error bounds
+        :return: Position with arrays lat, lon, course, speed; NaN outside the path
+        """
+        times = np.asarray(times, dtype=float) - self.start_time
+        lat, lon, course, speed = (np.full(times.shape, np.nan) for _ in range(4))
+
+        index = np.searchsorted(self._starts, times, side='right') - 1
+        valid = (index >= 0) & (index < len(self._data))
+        if fast:
+            lat[valid], lon[valid], course[valid], speed[valid] = \
+                Path._evaluate_local(self._data[index[valid]], times[valid] - self._starts[index[valid]])
+            return Path.Position(lat, lon, course, speed)
+        for i in np.unique(index[valid]):
+            mask = valid & (index == i)
+            lat[mask], lon[mask], course[mask], speed[mask] = \
+                Path._evaluate(self._data[i], times[mask] - self._starts[i],
+                               self._line(i) if self._data[i]['curve'] == 0 else None)
+        return Path.Position(lat, lon, course, speed)
+
+    def iter_polyline(self, max_error_m=10., max_step_s=None, fast=False):
+        """
+        Lazily densifies the path into a polyline. Arcs get as many vertices as
+        needed to keep chords within max_error_m of the arc, straight segments
+        only get their endpoints.
+        :param max_error_m: maximal distance between arc and its chord, meters
+        :param max_step_s: maximal time between vertices, seconds
+        :param fast: evaluate vertices in fast mode, see positions()
+        :return: generator of Vertex(time, lat, lon)
+        """
+        max_error = max_error_m / 1852  # [miles]
+        for i, segment in enumerate(self._data):
+            count = 1
+            if segment['curve'] != 0 and max_error < segment['radius']:
+                # Chord of angle step spans sagitta r * (1 - cos(step / 2))
+                step = 2 * math.acos(1 - max_error / segment['radius'])
+                count = max(count, math.ceil(abs(segment['length'] * segment['curve']) / step))
+            if max_step_s is not None:
+                count = max(count, math.ceil(segment['duration'] / max_step_s))
+            # Segment end is yielded only for the last one, others end where the next one starts
+            last = i == len(self._data) - 1
+            times = np.linspace(0, segment['duration'], count + 1)[:None if last else -1]
+            if fast:
+                lat, lon, _, _ = Path._evaluate_local(self._data[np.full(len(times), i)], times)
+            else:
+                lat, lon, _, _ = Path._evaluate(segment, times, self._line(i) if segment['curve'] == 0 else None)
+            for time, vertex_lat, vertex_lon in zip((times + self._starts[i] + self.start_time).tolist(),
+                                                    lat.tolist(), lon.tolist()):
+                yield Path.Vertex(time, vertex_lat, vertex_lon)
@@ -1,26 +1,174 @@
+import asyncio
+import copy
+import os
+import queue
+import signal
 import subprocess
-import tempfile
+import sys
+import threading
 import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .cache import ResultCache
+from .capture import Capture
 from .data import ScenarioData
+from .workspace import temporary_workspace
+
+# Solver output files
+OUTPUTS = ("maneuver.json", "nav-report.json", "target-maneuvers.json")
+
+# Size of chunks solver output is read by
+CHUNK_SIZE = 1 << 16
+# Usage is read with wait4 after waiting with waitid without reaping, which needs both of them
+# (waitid is missing on macOS before Python 3.13)
+WAIT_USAGE = hasattr(os, 'wait4') and hasattr(os, 'waitid')
+
+# Resource usage of solver process: CPU times in seconds, peak resident set size in bytes
+Usage = namedtuple('Usage', ['user_time', 'system_time', 'max_rss'])
 
 
 class RunResult:
-    def __init__(self, data, stdout, return_code, exec_time):
+    def __init__(self, data, stdout, return_code, exec_time, directory=None, timed_out=False, usage=None,
+                 log_file=None, cached=False):
         self.data = data
+        # First and last lines of output, whole output is in log_file when it is set
         self.stdout = stdout
+        self.log_file = log_file
         self.return_code = return_code
         self.exec_time = exec_time
+        self.directory = directory
+        self.timed_out = timed_out
+        # Usage, None where it is not supported
+        self.usage = usage
+        # Result restored from cache, exec_time and usage are those of the original run
+        self.cached = cached
+
+
+def _communicate(proc, capture, timeout=None):
+    """
+    Streams output of process into capture and waits for it, the process is killed after timeout
+    :param capture: simulator.capture.Capture
+    :return: Usage or None where it is not supported, see WAIT_USAGE, timed out flag
+    """
+    lock = threading.Lock()
+    exited = False
+    timed_out = False
+
+    def kill():
+        nonlocal timed_out
+        with lock:
+            if not exited:
+                timed_out = True
+                if WAIT_USAGE:
+                    os.kill(proc.pid, signal.SIGKILL)
+                else:
+                    proc.kill()
+
+    timer = threading.Timer(timeout, kill) if timeout is not None else None
+    if timer is not None:
+        timer.start()
+    try:
+        for data in iter(lambda: proc.stdout.read1(CHUNK_SIZE), b''):
+            capture.write(data)
+        proc.stdout.close()
+        if WAIT_USAGE:
+            # Wait without reaping first, so that the timer can not kill another process reusing the pid
+            os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        else:
+            proc.wait()
+        with lock:
+            exited = True
+    finally:
+        if timer is not None:
+            timer.cancel()
+        capture.close()
+    if not WAIT_USAGE:
+        return None, timed_out
+    _, status, rusage = os.wait4(proc.pid, 0)
+    # Same convention as Popen: negative signal number for killed processes
+    proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+    return Usage(rusage.ru_utime, rusage.ru_stime, max_rss), timed_out
+
+
+def _restore(cache, key, args, directory, log_file):
+    # Result from cache, with kept output written to log file as if the solver ran
+    cached = cache.restore(key, args, directory)
+    if cached is None:
+        return None
+    stdout, return_code, exec_time, usage = cached
+    if log_file is not None:
+        with open(log_file, 'wb') as f:
+            f.write(stdout)
+    return RunResult(None, stdout, return_code, exec_time, directory, usage=Usage(*usage) if usage is not None else None,
+                     log_file=log_file, cached=True)
 
 
 class Runner:
-    def __init__(self, executable):
+    def __init__(self, executable, cache_dir=None, workspaces=None):
+        """
+        :param executable: solver executable
+        :param cache_dir: directory of result cache, runs with unchanged solver and inputs are not repeated
+        :param workspaces: simulator.workspace.WorkspacePool for runs outside of case directories,
+        by default a temporary directory is made for every run
+        """
         self.executable = executable
+        self.cache = ResultCache(cache_dir) if cache_dir is not None else None
+        self.workspaces = workspaces
+
+    def _workspace(self):
+        return self.workspaces.acquire() if self.workspaces is not None else temporary_workspace()
+
+    def run(self, data, rvo=False, no_rvo=False, simple_prediction=False):
+        """
+        Runs solver on a scenario in memory. Inputs are written to a workspace
+        on RAM disk when available, and only solver outputs are read back and
+        merged into a copy of data.
+        :param data: ScenarioData
+        :return: RunResult
+        """
+        with self._workspace() as workspace:
+            data.dump_directory(workspace.directory, maneuver=None, analyse=None, predict=None)
+            result = self.execute(workspace.directory, rvo=rvo, no_rvo=no_rvo, simple_prediction=simple_prediction)
+            outputs = ScenarioData.load_directory(workspace.directory, targets=None, settings=None, nav_data=None,
+                                                  hydrometeo=None, constraints=None, route=None)
+
+        result_data = copy.copy(data)
+        result_data.maneuver, result_data.analyse, result_data.predict = \
+            outputs.maneuver, outputs.analyse, outputs.predict
+        result.data, result.directory = result_data, None
+        return result
+
+    def run_archive(self, archive, case, **kwargs):
+        """
+        Runs a case from a packed archive in a workspace
+        :param archive: simulator.archive.Archive
+        :param case: name of case
+        :return: RunResult
+        """
+        with self._workspace() as workspace:
+            archive.extract(case, workspace.directory)
+            result = self.run_directory(workspace.directory, **kwargs)
+        result.directory = None
+        return result
 
-    def run(self, data):
-        tmpdir = tempfile.TemporaryDirectory()
-        data.dump_directory(tmpdir.name)
-        result = self.run_directory(tmpdir.name)
-        tmpdir.cleanup()
+    def run_isolated(self, directory, output_dir=None, **kwargs):
+        """
+        Runs a case in a workspace, so that case directory is not written.
+        Files must have default names.
+        :param directory: case directory
+        :param output_dir: directory to copy solver outputs to, if any
+        :param kwargs: arguments of run_directory
+        :return: RunResult
+        """
+        with self._workspace() as workspace:
+            workspace.populate(directory)
+            result = self.run_directory(workspace.directory, **kwargs)
+            if output_dir is not None:
+                workspace.collect(output_dir, OUTPUTS)
+        result.directory = output_dir
         return result
 
     def run_directory(self, directory, targets="target-data.json",
@@ -34,7 +182,70 @@ class Runner:
                       predict="target-maneuvers.json",
                       rvo=False,
                       no_rvo=False,
-                      simple_prediction=False):
+                      simple_prediction=False,
+                      env=None,
+                      cpus=None,
+                      timeout=None,
+                      log_file=None,
+                      on_line=None):
+        result = self.execute(directory, targets, settings, nav_data, hydrometeo, constraints, route, maneuver,
+                              analyse, predict, rvo, no_rvo, simple_prediction, env=env, cpus=cpus, timeout=timeout,
+                              log_file=log_file, on_line=on_line)
+        result.data = ScenarioData.load_directory(directory, targets, settings, nav_data, hydrometeo, constraints,
+                                                  route, maneuver, analyse, predict)
+        return result
+
+    def run_many(self, directories, max_workers=None, cpus=None, env=None, isolated=False, **kwargs):
+        """
+        Runs solver on many directories concurrently
+        :param directories: iterable of case directories
+        :param max_workers: maximal number of concurrent runs, by default number of cpus
+        :param cpus: CPU ids to pin runs to, every running case gets one of them to itself
+        :param env: environment variables to override for every run
+        :param isolated: run cases in workspaces, see run_isolated
+        :param kwargs: arguments of run_directory
+        :return: generator of RunResult in order of completion
+        """
+        free_cpus = queue.Queue()
+        for cpu in cpus or []:
+            free_cpus.put(cpu)
+        if max_workers is None:
+            max_workers = len(cpus) if cpus else os.cpu_count()
+
+        def run(directory):
+            cpu = free_cpus.get() if cpus else None
+            try:
+                run_case = self.run_isolated if isolated else self.run_directory
+                return run_case(directory, env=env, cpus=None if cpu is None else [cpu], **kwargs)
+            finally:
+                if cpu is not None:
+                    free_cpus.put(cpu)
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = [executor.submit(run, directory) for directory in directories]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # Consumer may stop early, cases which have not started yet are dropped
+                for future in futures:
+                    future.cancel()
+
+    def arguments(self, targets="target-data.json",
+                  settings="settings.json",
+                  nav_data="nav-data.json",
+                  hydrometeo="hmi-data.json",
+                  constraints="constraints.json",
+                  route="route-data.json",
+                  maneuver="maneuver.json",
+                  analyse="nav-report.json",
+                  predict="target-maneuvers.json",
+                  rvo=False,
+                  no_rvo=False,
+                  simple_prediction=False):
+        """
+        :return: command line of solver
+        """
         args = [self.executable, "--targets", targets,
                 "--settings", settings,
                 "--nav-data", nav_data,
@@ -50,10 +261,165 @@ class Runner:
             args.append('--no-rvo')
         if simple_prediction:
             args.append('--simple-prediction')
+        return args
+
+    def execute(self, directory, *args, env=None, cpus=None, timeout=None, log_file=None, on_line=None, **kwargs):
+        """
+        Runs solver in directory without loading results, takes the same arguments as run_directory
+        :param env: environment variables to override
+        :param cpus: CPU ids to pin solver to, where supported
+        :param timeout: time limit, seconds; the solver is killed when it is exceeded
+        :param log_file: file to write the whole output to, only first and last lines are kept in memory
+        :param on_line: function called with every line of output as soon as it is read
+        :return: RunResult without data
+        """
+        args = self.arguments(*args, **kwargs)
+        if self.cache is not None:
+            key = self.cache.key(args, directory, env)
+            result = _restore(self.cache, key, args, directory, log_file)
+            if result is not None:
+                return result
+        run_env = dict(os.environ, **env) if env is not None else None
+        exec_time = time.perf_counter()
+        proc = subprocess.Popen(args, cwd=directory, env=run_env, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        if cpus is not None and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(proc.pid, cpus)
+            except ProcessLookupError:
+                # Already finished
+                pass
+            except OSError:
+                proc.kill()
+                proc.communicate()
+                raise
+        capture = Capture(log_file, on_line)
+        usage, timed_out = _communicate(proc, capture, timeout)
+        exec_time = time.perf_counter() - exec_time
+        stdout = capture.getvalue()
+        # Killed solvers have negative return codes, their results are not reproducible
+        if self.cache is not None and proc.returncode >= 0 and not timed_out:
+            self.cache.store(key, args, directory, stdout, proc.returncode, exec_time, usage)
+        return RunResult(None, stdout, proc.returncode, exec_time, directory, timed_out, usage, log_file)
+
+
+class AsyncRunner:
+    """
+    Runner on asyncio subprocesses. Solvers which exceed their timeout are
+    killed, and cancelled runs kill their solver too. Child processes are reaped
+    by asyncio, so resource usage is not collected.
+    """
+
+    def __init__(self, executable, cache_dir=None):
+        self.executable = executable
+        self._runner = Runner(executable, cache_dir)
+
+    async def execute(self, directory, *args, env=None, cpus=None, timeout=None, log_file=None, on_line=None,
+                      **kwargs):
+        """
+        Runs solver in directory without loading results, takes the same arguments as run_directory
+        :param timeout: time limit, seconds
+        :param log_file: file to write the whole output to, only first and last lines are kept in memory
+        :param on_line: function called with every line of stdout as soon as it is read
+        :return: RunResult without data
+        """
+        args = self._runner.arguments(*args, **kwargs)
+        cache = self._runner.cache
+        if cache is not None:
+            key = cache.key(args, directory, env)
+            result = _restore(cache, key, args, directory, log_file)
+            if result is not None:
+                return result
+        run_env = dict(os.environ, **env) if env is not None else None
+        exec_time = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(*args, cwd=directory, env=run_env,
+                                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        if cpus is not None and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(proc.pid, cpus)
+            except ProcessLookupError:
+                pass
+
+        capture = Capture(log_file, on_line)
+
+        async def communicate():
+            while True:
+                data = await proc.stdout.read(CHUNK_SIZE)
+                if not data:
+                    break
+                capture.write(data)
+            return await proc.wait()
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(communicate(), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            proc.kill()
+            await proc.wait()
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+        finally:
+            capture.close()
+        exec_time = time.perf_counter() - exec_time
+        stdout = capture.getvalue()
+        if cache is not None and not timed_out and proc.returncode >= 0:
+            cache.store(key, args, directory, stdout, proc.returncode, exec_time)
+        return RunResult(None, stdout, proc.returncode, exec_time, directory, timed_out, log_file=log_file)
+
+    async def run_directory(self, directory, targets="target-data.json",
+                            settings="settings.json",
+                            nav_data="nav-data.json",
+                            hydrometeo="hmi-data.json",
+                            constraints="constraints.json",
+                            route="route-data.json",
+                            maneuver="maneuver.json",
+                            analyse="nav-report.json",
+                            predict="target-maneuvers.json",
+                            rvo=False,
+                            no_rvo=False,
+                            simple_prediction=False,
+                            env=None,
+                            cpus=None,
+                            timeout=None,
+                            log_file=None,
+                            on_line=None):
+        """
+        Runs solver in directory, see Runner.run_directory
+        :param timeout: time limit, seconds; the solver is killed when it is exceeded
+        :param log_file: file to write the whole output to, only first and last lines are kept in memory
+        :param on_line: function called with every line of stdout as soon as it is read
+        :return: RunResult
+        """
+        result = await self.execute(
+            directory, targets, settings, nav_data, hydrometeo, constraints, route, maneuver, analyse, predict, rvo,
+            no_rvo, simple_prediction, env=env, cpus=cpus, timeout=timeout, log_file=log_file, on_line=on_line)
+        # Parsing results may take a while, it should not block the event loop
+        result.data = await asyncio.get_event_loop().run_in_executor(
+            None, ScenarioData.load_directory, directory, targets, settings, nav_data, hydrometeo, constraints, route,
+            maneuver, analyse, predict)
+        return result
+
+    async def run_many(self, directories, max_workers=None, **kwargs):
+        """
+        Runs solver on many directories concurrently
+        :param directories: iterable of case directories
+        :param max_workers: maximal number of concurrent runs, by default number of cpus
+        :param kwargs: arguments of run_directory
+        :return: async generator of RunResult in order of completion
+        """
+        semaphore = asyncio.Semaphore(max_workers or os.cpu_count())
 
-        exec_time = time.time()
-        completed_proc = subprocess.run(args, cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        exec_time = time.time() - exec_time
+        async def run(directory):
+            async with semaphore:
+                return await self.run_directory(directory, **kwargs)
 
-        return RunResult(ScenarioData.load_directory(directory), completed_proc.stdout, completed_proc.returncode,
-                         exec_time)
+        tasks = [asyncio.ensure_future(run(directory)) for directory in directories]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,132 @@
+import json
+
+import numpy as np
+
+from simulator.geodesy import local_direct
+from simulator.path import Path
+
+# Mean radius of the Earth, miles
+EARTH_RADIUS = 3440.
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """
+    Yields elements of a top-level JSON array one by one, keeping in memory
+    only the element being parsed instead of the whole file
+    :param f: text file object
+    :param chunk_size: size of reads, characters
+    :return: generator of parsed elements
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def skip(chars):
+        # Skips given characters, returns False if buffer ended
+        nonlocal pos
+        while pos < len(buffer) and buffer[pos] in chars:
+            pos += 1
+        return pos < len(buffer)
+
+    def read(size):
+        nonlocal buffer, pos, eof
+        chunk = f.read(size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    read(chunk_size)
+    while not skip(' \t\r\n'):
+        if eof:
+            raise ValueError('Empty JSON file')
+        read(chunk_size)
+    if buffer[pos] != '[':
+        raise ValueError('JSON array expected')
+    pos += 1
+
+    while True:
+        while not skip(' \t\r\n,'):
+            if eof:
+                raise ValueError('Unterminated JSON array')
+            read(chunk_size)
+        if buffer[pos] == ']':
+            return
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+            # A number may continue in the next chunk, it is complete only when followed by a delimiter
+            complete = eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]')
+        except ValueError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            # Grow reads with the element, so long elements are not re-parsed too many times
+            read(max(chunk_size, len(buffer)))
+            continue
+        pos = end
+        yield element
+
+
+def _segment_bounds(items):
+    """
+    Bounding boxes of track segments
+    :param items: segments as stored in JSON
+    :return: arrays lat_min, lat_max, west and east longitude, east may exceed 180 across the antimeridian
+    """
+    lat, lon, azi, curve, length = (np.array([item[name] for item in items], dtype=float)
+                                    for name in ('lat', 'lon', 'begin_angle', 'curve', 'length'))
+    straight = curve == 0
+    end_lat, end_lon = local_direct(lat, lon, azi, np.where(straight, length, 0))
+    dlon = (end_lon - lon + 180) % 360 - 180
+    # Arcs stay within their diameter from the start, geodesics bulge poleward of their end points
+    # by about length ** 2 * tan(lat) / (8 * EARTH_RADIUS), which is doubled for safety
+    polar = np.radians(np.minimum(np.maximum(np.abs(lat), np.abs(end_lat)), 89.))
+    with np.errstate(divide='ignore'):
+        margin = np.where(straight, length ** 2 * np.tan(polar) / (4 * EARTH_RADIUS),
+                          np.minimum(length, 2 / np.abs(curve))) / 60
+    lat_min, lat_max = np.minimum(lat, end_lat) - margin, np.maximum(lat, end_lat) + margin
+    margin_lon = margin / np.cos(polar)
+    return (lat_min, lat_max, lon + np.minimum(dlon, 0) - margin_lon, lon + np.maximum(dlon, 0) + margin_lon)
+
+
+def _intersects(array, begin, end, bbox):
+    if begin is not None or end is not None:
+        start_time = array['start_time']
+        end_time = start_time + sum(item['duration'] for item in array['items'])
+        if (begin is not None and end_time < begin) or (end is not None and start_time > end):
+            return False
+    if bbox is not None:
+        if not array['items']:
+            return False
+        lat_min, lat_max, lon_min, lon_max = bbox
+        south, north, west, east = _segment_bounds(array['items'])
+        # Longitude ranges are compared on the circle
+        crosses = ((lon_min - west) % 360 <= east - west) | ((west - lon_min) % 360 <= lon_max - lon_min)
+        if not np.any((south <= lat_max) & (north >= lat_min) & crosses):
+            return False
+    return True
+
+
+def read_paths(f, begin=None, end=None, bbox=None):
+    """
+    Streams paths from a JSON array like target-maneuvers.json. Tracks
+    outside the filters are skipped before a Path is built for them.
+    :param f: text file object
+    :param begin: skip tracks which end before this timestamp
+    :param end: skip tracks which start after this timestamp
+    :param bbox: (lat_min, lat_max, lon_min, lon_max), skip tracks with no segment crossing it.
+    Segments are tested by their bounding boxes, so tracks passing close to it may be kept.
+    :return: generator of Path
+    """
+    for array in iter_json_array(f):
+        if _intersects(array, begin, end, bbox):
+            yield Path.load_from_array(array)
+
+
+def iter_paths(filename, begin=None, end=None, bbox=None):
+    """
+    Streams paths from a file, see read_paths
+    :param filename: name of file
+    :return: generator of Path
+    """
+    with open(filename) as f:
+        yield from read_paths(f, begin, end, bbox)
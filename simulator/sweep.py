@@ -0,0 +1,155 @@
+import copy
+import csv
+import itertools
+import json
+import os
+import random
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+from .data import is_case
+from .workspace import INPUTS, RAM_DIR, Workspace
+
+# Row of sweep result table, deviation and separation are in miles, None when there is no solution
+SweepResult = namedtuple('SweepResult', ['case', 'params', 'return_code', 'exec_time', 'solver_name',
+                                         'max_route_deviation', 'min_separation'])
+
+
+def set_key(settings, key, value):
+    """
+    Sets a value in nested settings by dotted key, e.g. 'safety_control.cpa'
+    """
+    *path, name = key.split('.')
+    for part in path:
+        settings = settings.setdefault(part, {})
+    settings[name] = value
+
+
+def grid(space):
+    """
+    :param space: dict of dotted key to list of values
+    :return: list of dicts with every combination of values
+    """
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+
+
+def random_sample(space, count, seed=None):
+    """
+    :param space: dict of dotted key to (low, high) tuple for uniform sampling, or list of values to choose from
+    :param count: number of samples
+    :param seed: random seed
+    :return: list of dicts
+    """
+    rng = random.Random(seed)
+    return [{key: rng.uniform(*values) if isinstance(values, tuple) else rng.choice(values)
+             for key, values in space.items()}
+            for _ in range(count)]
+
+
+def find_cases(directories):
+    """
+    :param directories: case directories or roots of case trees
+    :return: list of case directories
+    """
+    cases = []
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            if is_case(files):
+                cases.append(root)
+    return cases
+
+
+def materialize(case, variants, directory):
+    """
+    Makes a directory for every variant of a case with inputs linked and settings changed
+    :param case: case directory
+    :param variants: list of dicts of dotted key to value
+    :param directory: directory to make variant directories in
+    :return: list of variant directories
+    """
+    try:
+        with open(os.path.join(case, "settings.json")) as f:
+            settings = json.load(f)
+    except FileNotFoundError:
+        settings = {}
+    directories = []
+    for i, params in enumerate(variants):
+        workspace = Workspace(os.path.join(directory, str(i)))
+        if os.path.isdir(workspace.directory):
+            # Left from an earlier sweep kept in the same directory
+            workspace.clear()
+        else:
+            os.mkdir(workspace.directory)
+        # Settings are written anew, a linked file would change the source case
+        workspace.populate(case, [filename for filename in INPUTS if filename != "settings.json"])
+        variant = copy.deepcopy(settings)
+        for key, value in params.items():
+            set_key(variant, key, value)
+        with open(os.path.join(workspace.directory, "settings.json"), 'w') as f:
+            json.dump(variant, f)
+        directories.append(workspace.directory)
+    return directories
+
+
+def summarize(data):
+    """
+    :param data: ScenarioData with solver results
+    :return: solver name, maximal route deviation, minimal separation to targets; None where not available
+    """
+    if not data.maneuver:
+        return None, None, None
+    solver_name = data.maneuver[0].solver_name
+    max_route_deviation = None
+    if data.route is not None:
+        cross_track = np.abs(data.route_deviation().cross_track)
+        max_route_deviation = float(np.nanmax(cross_track)) if np.any(~np.isnan(cross_track)) else 0.
+    min_separation = None
+    if data.predict:
+        separation = data.separations().min_distance[0, 1:]
+        if not np.isnan(separation).all():
+            min_separation = float(np.nanmin(separation))
+    return solver_name, max_route_deviation, min_separation
+
+
+def sweep(runner, cases, variants, directory=None, **kwargs):
+    """
+    Runs every variant of settings on every case concurrently
+    :param runner: simulator.runner.Runner
+    :param cases: list of case directories
+    :param variants: list of dicts of dotted key to value, see grid and random_sample
+    :param directory: directory to keep variant directories in, by default a temporary one on RAM disk
+    :param kwargs: arguments of Runner.run_many
+    :return: generator of SweepResult in order of completion
+    """
+    tmpdir = None
+    if directory is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix='ktviz-sweep-', dir=RAM_DIR if os.path.isdir(RAM_DIR) else None)
+        directory = tmpdir.name
+    try:
+        origins = {}
+        for i, case in enumerate(cases):
+            os.makedirs(os.path.join(directory, str(i)), exist_ok=True)
+            for variant_dir, params in zip(materialize(case, variants, os.path.join(directory, str(i))), variants):
+                origins[variant_dir] = case, params
+        for result in runner.run_many(list(origins), **kwargs):
+            case, params = origins[result.directory]
+            yield SweepResult(case, params, result.return_code, result.exec_time, *summarize(result.data))
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+def write_csv(results, f, keys):
+    """
+    Writes sweep results as a table with a column for every swept key
+    :param results: iterable of SweepResult
+    :param f: text file
+    :param keys: dotted keys of swept settings
+    """
+    writer = csv.writer(f)
+    writer.writerow(['case'] + list(keys) + list(SweepResult._fields[2:]))
+    for result in results:
+        writer.writerow([result.case] + [result.params.get(key) for key in keys] + list(result[2:]))
@@ -0,0 +1,110 @@
+import contextlib
+import os
+import queue
+import shutil
+import tempfile
+
+# RAM-backed location for temporary working directories, used when it exists
+RAM_DIR = '/dev/shm'
+
+# Solver input files, linked into workspaces by default
+INPUTS = ("target-data.json", "settings.json", "nav-data.json", "hmi-data.json", "constraints.json",
+          "route-data.json")
+
+
+def _temp_root():
+    return RAM_DIR if os.path.isdir(RAM_DIR) else None
+
+
+class Workspace:
+    """
+    Working directory of a solver run
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def populate(self, source, filenames=INPUTS):
+        """
+        Puts input files into workspace, hard linked where possible and copied otherwise
+        :param source: directory with input files
+        :param filenames: names of files, missing ones are skipped
+        """
+        for filename in filenames:
+            src = os.path.join(source, filename)
+            dst = os.path.join(self.directory, filename)
+            try:
+                os.link(src, dst)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Different file systems, or links are not supported
+                shutil.copyfile(src, dst)
+
+    def collect(self, destination, filenames):
+        """
+        Copies files from workspace to destination directory, missing ones are skipped
+        """
+        for filename in filenames:
+            try:
+                shutil.copyfile(os.path.join(self.directory, filename), os.path.join(destination, filename))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """
+        Removes everything from workspace
+        """
+        for entry in os.scandir(self.directory):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+
+
+class WorkspacePool:
+    """
+    Preallocated working directories on RAM disk when available, which are cleared and reused between runs
+    """
+
+    def __init__(self, size, root=None):
+        """
+        :param size: number of workspaces, runs beyond it wait for a free one
+        :param root: directory to create workspaces in
+        """
+        self._root = tempfile.TemporaryDirectory(prefix='ktviz-', dir=root if root is not None else _temp_root())
+        self._free = queue.Queue()
+        for i in range(size):
+            directory = os.path.join(self._root.name, str(i))
+            os.mkdir(directory)
+            self._free.put(Workspace(directory))
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """
+        :return: context manager with a free Workspace, it is cleared and returned to pool on exit
+        """
+        workspace = self._free.get()
+        try:
+            yield workspace
+        finally:
+            workspace.clear()
+            self._free.put(workspace)
+
+    def close(self):
+        self._root.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+@contextlib.contextmanager
+def temporary_workspace():
+    """
+    :return: context manager with a Workspace in a new temporary directory, which is removed on exit
+    """
+    with tempfile.TemporaryDirectory(dir=_temp_root()) as directory:
+        yield Workspace(directory)
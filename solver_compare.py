@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+from simulator.compare import Thresholds, compare_runs, compare_trees, write_csv
+from simulator.runner import Runner
+from simulator.sweep import find_cases
+from simulator.workspace import WorkspacePool
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compares maneuvers of two solvers case by case")
+    parser.add_argument("command", choices=["run", "trees"],
+                        help="Run two executables on cases, or compare two existing result trees")
+    parser.add_argument("a", type=str, help="Executable or result tree A (reference)")
+    parser.add_argument("b", type=str, help="Executable or result tree B")
+    parser.add_argument("cases", type=str, nargs='*', help="Case directories or roots of case trees to run on",
+                        default=[os.getcwd()])
+    parser.add_argument("--workers", type=int, help="Number of concurrent runs")
+    parser.add_argument("--rvo", action="store_true", help="Run USV with --rvo")
+    parser.add_argument("--no-rvo", action="store_true", help="Run USV with --no-rvo")
+    parser.add_argument("--step", type=float, default=1., help="Sampling step of positions, seconds")
+    parser.add_argument("--max-divergence", type=float, default=0.05,
+                        help="Flag cases with positions diverging more, miles")
+    parser.add_argument("--max-duration-delta", type=float, default=60.,
+                        help="Flag cases with maneuver durations differing more, seconds")
+    parser.add_argument("--max-exec-time-ratio", type=float, default=2.,
+                        help="Flag cases where B runs this many times longer than A")
+    parser.add_argument("--flagged-only", action="store_true", help="Only output flagged cases")
+    parser.add_argument("--output", type=str, help="CSV file for results, stdout by default")
+    args = parser.parse_args()
+
+    thresholds = Thresholds(args.max_divergence, args.max_duration_delta, args.max_exec_time_ratio)
+    workspaces = None
+    if args.command == "run":
+        cases = find_cases(args.cases)
+        workers = args.workers or os.cpu_count()
+        workspaces = WorkspacePool(workers)
+        comparisons = compare_runs(Runner(os.path.abspath(args.a), workspaces=workspaces),
+                                   Runner(os.path.abspath(args.b), workspaces=workspaces),
+                                   cases, workers, thresholds, args.step, rvo=args.rvo, no_rvo=args.no_rvo)
+    else:
+        comparisons = compare_trees(args.a, args.b, args.workers, thresholds, args.step)
+
+    flagged = []
+
+    def collect():
+        for comparison in comparisons:
+            if comparison.flagged:
+                flagged.append(comparison.case)
+            if comparison.flagged or not args.flagged_only:
+                yield comparison
+
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as f:
+            write_csv(collect(), f)
+    else:
+        write_csv(collect(), sys.stdout)
+    if workspaces is not None:
+        workspaces.close()
+
+    print('{} cases flagged'.format(len(flagged)), file=sys.stderr)
+    sys.exit(1 if flagged else 0)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from geographiclib.geodesic import Geodesic
+
+from simulator.cpa import closest_approach
+from simulator.path import Path
+
+
+def _crossing(lat, lon, azi_from, length, duration, curve=0., shift=0.):
+    # Straight leg or arc passing its midpoint near (lat, lon), the midpoint is moved by shift miles to the north
+    start = Geodesic.WGS84.Direct(lat, lon, azi_from, length / 2 * 1852)
+    start = Geodesic.WGS84.Direct(start['lat2'], start['lon2'], 0., shift * 1852)
+    azi = Geodesic.WGS84.Inverse(start['lat2'], start['lon2'], lat, lon)['azi1']
+    return Path(0, [Path.Segment(start['lat2'], start['lon2'], azi, curve, length, duration, 1, 1)])
+
+
+def _dense_minimum(path1, path2, step=1.):
+    times = np.arange(0, min(path1.segment_times()[-1], path2.segment_times()[-1]), step)
+    a, b = path1.positions(times), path2.positions(times)
+    return min(Geodesic.WGS84.Inverse(*point)['s12'] for point in zip(a.lat, a.lon, b.lat, b.lon)) / 1852
+
+
+@pytest.mark.parametrize('length', [10., 20., 40.])
+def test_collision_at_high_latitude(length):
+    # Both ships pass the same point at the middle of their legs
+    path1 = _crossing(60., 30., 200., length, length * 360)
+    path2 = _crossing(60., 30., 290., length, length * 360)
+    approach = closest_approach(path1, path2)
+    assert approach.distance * 1852 < 1.
+    assert approach.time == pytest.approx(length * 180, abs=1.)
+
+
+@pytest.mark.parametrize('lat', [60., 70.])
+@pytest.mark.parametrize('curve', [0., .05])
+def test_matches_dense_sampling(lat, curve):
+    path1 = _crossing(lat, 30., 170., 40., 14400, curve)
+    path2 = _crossing(lat, 30., 260., 30., 9000, shift=2.)
+    approach = closest_approach(path1, path2)
+    assert approach.distance * 1852 == pytest.approx(_dense_minimum(path1, path2) * 1852, abs=1.)
+
+
+def test_no_overlap():
+    path1 = _crossing(60., 30., 0., 10., 3600)
+    path2 = Path(7200, path1.items)
+    assert closest_approach(path1, path2) == (None, None)
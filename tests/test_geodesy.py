@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from geographiclib.geodesic import Geodesic
+
+from simulator.geodesy import local_direct, local_inverse
+from simulator.path import Path
+
+LATITUDES = [-75., -45., 0., 30., 60., 80.]
+AZIMUTHS = np.arange(0., 360., 15.)
+# Documented error bounds of local_direct and local_inverse, meters
+BOUNDS = [(10., .3), (20., 1.1)]
+
+
+def _error_m(lat1, lon1, lat2, lon2):
+    return Geodesic.WGS84.Inverse(lat1, lon1, lat2, lon2)['s12']
+
+
+@pytest.mark.parametrize('dist, bound', BOUNDS)
+@pytest.mark.parametrize('lat', LATITUDES)
+def test_direct_error(dist, bound, lat):
+    lat2, lon2 = local_direct(lat, 30., AZIMUTHS, dist)
+    for azi, fast_lat, fast_lon in zip(AZIMUTHS, lat2, lon2):
+        exact = Geodesic.WGS84.Direct(lat, 30., azi, dist * 1852)
+        assert _error_m(exact['lat2'], exact['lon2'], fast_lat, fast_lon) < bound
+
+
+@pytest.mark.parametrize('dist, bound', BOUNDS)
+@pytest.mark.parametrize('lat', LATITUDES)
+def test_inverse_error(dist, bound, lat):
+    ends = [Geodesic.WGS84.Direct(lat, 30., azi, dist * 1852) for azi in AZIMUTHS]
+    azi, fast_dist = local_inverse(lat, 30., np.array([end['lat2'] for end in ends]),
+                                   np.array([end['lon2'] for end in ends]))
+    for end, fast_azi, fast_s in zip(ends, azi, fast_dist):
+        exact = Geodesic.WGS84.Inverse(lat, 30., end['lat2'], end['lon2'])
+        # Both distance error and azimuth error moved to the end point stay within the bound
+        assert abs(fast_s * 1852 - exact['s12']) < bound
+        assert abs(np.radians((fast_azi - exact['azi1'] + 180) % 360 - 180)) * exact['s12'] < bound
+
+
+def test_direct_wraps_longitude():
+    exact = Geodesic.WGS84.Direct(0., 179.99, 90., 5 * 1852)
+    lat, lon = local_direct(0., 179.99, 90., 5.)
+    assert -180 <= lon < 180
+    assert _error_m(exact['lat2'], exact['lon2'], float(lat), float(lon)) < .3
+
+
+def test_fast_positions_across_antimeridian():
+    path = Path(0, [Path.Segment(10., 179.99, 90., 0, 5., 1800., 1, 1)])
+    exact, fast = path.position(1200), path.position(1200, fast=True)
+    assert exact.lon < 0 and fast.lon < 0
+    assert _error_m(exact.lat, exact.lon, fast.lat, fast.lon) < .3
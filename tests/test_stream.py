@@ -0,0 +1,50 @@
+import io
+import json
+
+import pytest
+
+from simulator.stream import iter_json_array, read_paths
+
+ELEMENTS = [1, 2.5, -3e-7, 1.25E+3, 0, True, False, None, "a, ]b", {"x": [1, 2.0, {"y": "z"}]}, [], [[1e10]], 12345.678]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 7, 16, 1 << 16])
+@pytest.mark.parametrize('separators', [(',', ':'), (', ', ': '), (' ,\n ', ' : ')])
+def test_round_trip(chunk_size, separators):
+    text = json.dumps(ELEMENTS, separators=separators)
+    assert list(iter_json_array(io.StringIO(text), chunk_size)) == ELEMENTS
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1 << 16])
+def test_empty_array(chunk_size):
+    assert list(iter_json_array(io.StringIO(' [ ] '), chunk_size)) == []
+
+
+@pytest.mark.parametrize('text', ['', '{}', '[1, 2'])
+def test_malformed(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 2))
+
+
+def _track(lat, lon, begin_angle, curve, length):
+    return {'start_time': 0, 'items': [{'lat': lat, 'lon': lon, 'begin_angle': begin_angle, 'curve': curve,
+                                        'length': length, 'duration': length * 360, 'starboard_dev': 1,
+                                        'port_dev': 1}]}
+
+
+@pytest.mark.parametrize('track, inside', [
+    # Long leg passing through the box with both ends outside of it
+    (_track(59.9, 29.5, 90., 0, 60.), True),
+    (_track(59.7, 29.5, 90., 0, 60.), False),
+    # Arc leaving the box and coming back into it
+    (_track(59.9, 29.85, 0., .5, 6.), True),
+    (_track(59.9, 179.9, 90., 0, 10.), False),
+])
+def test_read_paths_bbox(track, inside):
+    paths = list(read_paths(io.StringIO(json.dumps([track])), bbox=(59.8, 60.0, 29.9, 30.1)))
+    assert len(paths) == int(inside)
+
+
+def test_read_paths_bbox_across_antimeridian():
+    track = _track(10., 179.9, 90., 0, 20.)
+    assert len(list(read_paths(io.StringIO(json.dumps([track])), bbox=(9.9, 10.1, -179.9, -179.7)))) == 1